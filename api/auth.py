@@ -1,3 +1,4 @@
+from collections import namedtuple
 from uuid import UUID
 
 import jwt
@@ -5,11 +6,15 @@ from flask import request
 from werkzeug.exceptions import Forbidden
 
 import config
+from api.cache import principal_cache
 from api.errors import UnauthorizedError
 from api import strings
-from api.models import User, UserRoleEnum
+from api.models import User, UserRoleEnum, UserStatusEnum
+from api.revocation import token_version, is_revoked
 from api.util import get_auth_exp, fetch_by_filter
 
+Principal = namedtuple('Principal', 'uuid role status deleted_at')
+
 
 def decode_auth_token(auth_token):
     """
@@ -25,14 +30,83 @@ def decode_auth_token(auth_token):
     except jwt.InvalidTokenError as err:
         raise UnauthorizedError(str(err))
 
-    user = fetch_by_filter(User, dict(uuid=payload['identity']))
-    if not user:
-        raise UnauthorizedError(strings.INVALID_CREDENTIAL)
+    if 'ver' in payload:
+        principal = get_claims_principal(payload)
+    else:
+        principal = get_principal(payload['identity'])
+
+    # users without a status predate it and stay active
+    if principal.status not in (None, UserStatusEnum.ACTIVE.value):
+        raise UnauthorizedError(strings.USER_INACTIVE)
 
-    request.user = user
+    request.principal = principal
     return payload
 
 
+def get_claims_principal(payload):
+    """
+    Authenticated principal from the signed claims of a token, without
+    touching the database. Tokens issued before the user's access changed
+    are rejected through the revocation table
+    :param payload: decoded JWT - dict
+    :return: Principal
+    """
+    try:
+        user_uuid = UUID(str(payload['identity']))
+    except ValueError:
+        raise UnauthorizedError(strings.INVALID_TOKEN)
+
+    if is_revoked(user_uuid, payload['ver']):
+        raise UnauthorizedError(strings.TOKEN_REVOKED)
+
+    return Principal(user_uuid, payload.get('role'), payload.get('status'),
+                     None)
+
+
+def get_principal(identity):
+    """
+    Authenticated principal of a token identity, cached by user uuid.
+    The `User` row fetched on a cache miss is kept as `request.user`
+    :param identity: string - user uuid
+    :return: Principal
+    """
+    try:
+        key = str(UUID(str(identity)))
+    except ValueError:
+        raise UnauthorizedError(strings.INVALID_TOKEN)
+
+    principal = principal_cache.get(key)
+    if principal is None:
+        user = fetch_by_filter(User, dict(uuid=key))
+        if not user:
+            raise UnauthorizedError(strings.INVALID_CREDENTIAL)
+
+        principal = Principal(user.uuid, user.role, user.status,
+                              user.deleted_at)
+        principal_cache.set(key, principal)
+        request.user = user
+
+    if principal.deleted_at is not None:
+        raise UnauthorizedError(strings.INVALID_CREDENTIAL)
+
+    return principal
+
+
+def current_user():
+    """
+    Authenticated `User` row, loaded on first use within the request
+    :return: User object
+    """
+    user = getattr(request, 'user', None)
+    if user is None:
+        user = fetch_by_filter(User, dict(uuid=request.principal.uuid))
+        if not user:
+            raise UnauthorizedError(strings.INVALID_CREDENTIAL)
+        request.user = user
+
+    return user
+
+
 def get_jwt_payload(token):
     """
     Creating JWT token using identity
@@ -44,19 +118,34 @@ def get_jwt_payload(token):
                       algorithms=[config.JWT_ALGORITHM])
 
 
-def get_jwt(identity, exp_time_limit):
+def get_jwt(identity, exp_time_limit, claims=None):
     """
     Creating JWT token using identity
     :param exp_time_limit: int - In Minutes
     :param identity: dict
+    :param claims: dict - extra signed claims, see `get_token_claims`
     :return: JWT - String
     """
     identity = dict(identity=identity, exp=get_auth_exp(exp_time_limit))
+    if claims:
+        identity.update(claims)
     return jwt.encode(identity,
                       config.SECRET_KEY,
                       config.JWT_ALGORITHM).decode("utf-8")
 
 
+def get_token_claims(user):
+    """
+    Authorization claims embedded in tokens when `JWT_EMBED_CLAIMS` is on
+    :param user: User object
+    :return: dict|None
+    """
+    if not config.JWT_EMBED_CLAIMS:
+        return None
+
+    return dict(role=user.role, status=user.status, ver=token_version())
+
+
 def has_access(field):
     """
     Validates that the user is authorized to access/edit a resource based on
@@ -64,7 +153,7 @@ def has_access(field):
     :param field: string
     :return: bool
     """
-    user = request.user
+    user = getattr(request, 'principal', None)
 
     if not isinstance(field, UUID):
         field = UUID(field)
@@ -72,3 +161,15 @@ def has_access(field):
     if not user or (user.uuid != field and
                     user.role != UserRoleEnum.ADMIN.value):
         raise Forbidden(strings.FORBIDDEN)
+
+
+def has_role(role):
+    """
+    Validates that the authenticated user has the given `role`
+    :param role: UserRoleEnum
+    :return: Forbidden if not
+    """
+    user = getattr(request, 'principal', None)
+
+    if not user or user.role != role.value:
+        raise Forbidden(strings.FORBIDDEN)
@@ -30,14 +30,18 @@ class Blueprint(flask.blueprints.Blueprint):
         super(Blueprint, self).__init__(name, import_name, **kwargs)
         self.api_prefix = api_prefix
 
-    def route(self, rule, version=1, **options):
+    def route(self, rule, version=1, statement_timeout=None, **options):
         # pylint:disable=arguments-differ
         """Like :meth:`Flask.route` but for a blueprint.  The endpoint for the
         :func:`url_for` function is prefixed with the name of the blueprint.
+
+        `statement_timeout` (ms) caps every database statement of the route.
         """
 
         def decorator(f):  # pylint:disable=invalid-name
             endpoint = options.pop("endpoint", f.__name__)
+            if statement_timeout is not None:
+                f.statement_timeout = statement_timeout
             updated_rule = rule
 
             if version:
@@ -0,0 +1,78 @@
+""" In-process caches """
+import threading
+import time
+from collections import OrderedDict
+
+import config
+from api import metrics
+
+_MISSING = object()
+
+
+class TTLCache:
+    """ Thread-safe LRU cache whose entries expire after `ttl` seconds """
+
+    def __init__(self, maxsize, ttl, enabled=True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """ Cached value for `key`, or `default` if missing or expired """
+        if not self.enabled:
+            return default
+
+        with self._lock:
+            value, expires_at = self._data.get(key, (_MISSING, None))
+            if value is not _MISSING and expires_at <= time.monotonic():
+                del self._data[key]
+                value = _MISSING
+
+            if value is _MISSING:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """ Cache `value`, evicting the least recently used entries """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """ Drop the entry for `key` if cached """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """ Drop every entry """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """ Cache counters """
+        return dict(enabled=self.enabled, size=len(self._data),
+                    maxsize=self.maxsize, ttl=self.ttl, hits=self.hits,
+                    misses=self.misses, evictions=self.evictions)
+
+
+# authenticated principals (uuid, role, status, deleted_at) by user uuid
+principal_cache = TTLCache(  # pylint:disable=invalid-name
+    config.AUTH_CACHE_SIZE, config.AUTH_CACHE_TTL_SECONDS,
+    enabled=config.AUTH_CACHE_ENABLED)
+
+metrics.register('auth_cache', principal_cache.stats)
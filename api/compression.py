@@ -0,0 +1,254 @@
+""" Response compression """
+import threading
+import time
+import zlib
+
+from flask import request
+
+import config
+from api import metrics
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None  # pylint:disable=invalid-name
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # pylint:disable=invalid-name
+
+ACCEPT_ENCODING = 'Accept-Encoding'
+# content codings that can tag a compressed representation's ETag
+CONTENT_CODINGS = ('gzip', 'deflate', 'br', 'zstd')
+# responses that have no body, or a body that must not be re-encoded
+SKIPPED_STATUS_CODES = (204, 206, 304)
+
+
+class ZlibCompressor:
+    """ gzip (`wbits` 16 + MAX_WBITS) or deflate (zlib format) stream """
+
+    def __init__(self, level, wbits=zlib.MAX_WBITS):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data, flush=False):
+        """
+        Compressing a piece of the body
+        :param data: bytes
+        :param flush: Boolean - emit everything compressed so far, so the
+        client can decode the piece without waiting for the rest
+        :return: bytes
+        """
+        out = self._obj.compress(data)
+        return out + self._obj.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        """ End of the stream """
+        return self._obj.flush()
+
+
+class BrotliCompressor:
+    """ br stream """
+
+    def __init__(self, level):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data, flush=False):
+        """ see `ZlibCompressor.compress` """
+        out = self._obj.process(data)
+        return out + self._obj.flush() if flush else out
+
+    def finish(self):
+        """ End of the stream """
+        return self._obj.finish()
+
+
+class ZstdCompressor:
+    """ zstd stream """
+
+    def __init__(self, level):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data, flush=False):
+        """ see `ZlibCompressor.compress` """
+        out = self._obj.compress(data)
+        return out + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) \
+            if flush else out
+
+    def finish(self):
+        """ End of the stream """
+        return self._obj.flush()
+
+
+def _compressors():
+    """ Content coding -> compressor factory, for the installed libraries """
+    factories = dict(
+        gzip=lambda: ZlibCompressor(config.COMPRESS_LEVEL, 16 + zlib.MAX_WBITS),
+        deflate=lambda: ZlibCompressor(config.COMPRESS_LEVEL))
+    if brotli is not None:
+        factories['br'] = lambda: BrotliCompressor(config.COMPRESS_BR_LEVEL)
+    if zstandard is not None:
+        factories['zstd'] = lambda: ZstdCompressor(config.COMPRESS_ZSTD_LEVEL)
+    return factories
+
+
+COMPRESSORS = _compressors()
+
+
+class CompressionStats:
+    """ Compressed responses, bytes in/out and CPU time spent compressing """
+
+    def __init__(self):
+        self.responses = 0
+        self.streamed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+        self.encodings = {}
+        self._lock = threading.Lock()
+
+    def record(self, encoding, bytes_in, bytes_out, cpu_seconds,
+               streamed=False):
+        """ Recording one compressed response """
+        with self._lock:
+            self.responses += 1
+            self.streamed += int(streamed)
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.cpu_seconds += cpu_seconds
+            self.encodings[encoding] = self.encodings.get(encoding, 0) + 1
+
+    def stats(self):
+        """ Compression ratio (out / in) and CPU time """
+        with self._lock:
+            return dict(
+                responses=self.responses, streamed=self.streamed,
+                bytes_in=self.bytes_in, bytes_out=self.bytes_out,
+                ratio=round(self.bytes_out / self.bytes_in, 4)
+                if self.bytes_in else None,
+                cpu_ms=round(self.cpu_seconds * 1000, 2),
+                encodings=dict(self.encodings))
+
+
+compression_stats = CompressionStats()  # pylint:disable=invalid-name
+metrics.register('compression', compression_stats.stats)
+
+
+def negotiate_encoding():
+    """
+    Content coding for the request's `Accept-Encoding`, preferring
+    `COMPRESS_ALGORITHMS` order on equal quality
+    :return: String or None for identity
+    """
+    available = [algorithm for algorithm in config.COMPRESS_ALGORITHMS
+                 if algorithm in COMPRESSORS]
+    return request.accept_encodings.best_match(available)
+
+
+def coded_etag(etag, encoding):
+    """
+    Strong ETag of the `encoding` representation: every content coding of a
+    resource is a different representation, with its own strong validator
+    :param etag: String - unquoted etag of the identity representation
+    :param encoding: String - content coding
+    :return: String - unquoted etag
+    """
+    return '{}-{}'.format(etag, encoding)
+
+
+def strip_coding(etag):
+    """
+    ETag of the identity representation, see `coded_etag`
+    :param etag: String - unquoted etag
+    :return: String - unquoted etag
+    """
+    for encoding in CONTENT_CODINGS:
+        if etag.endswith('-' + encoding):
+            return etag[:-len(encoding) - 1]
+    return etag
+
+
+def _set_encoding(response, encoding):
+    response.headers['Content-Encoding'] = encoding
+    # weak ETags may be shared by every coding, strong ones may not
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(coded_etag(etag, encoding))
+
+
+def _is_compressible(response):
+    if response.status_code < 200 or \
+            response.status_code in SKIPPED_STATUS_CODES:
+        return False
+    # already encoded bodies and files sent with `send_file`
+    if 'Content-Encoding' in response.headers or response.direct_passthrough:
+        return False
+    return response.mimetype in config.COMPRESS_MIMETYPES
+
+
+def _compress_stream(chunks, encoding, compressor):
+    """ Compressing a streamed body piece by piece, as it is produced """
+    bytes_in, bytes_out, cpu_seconds = 0, 0, 0.0
+    try:
+        for chunk in chunks:
+            start = time.thread_time()
+            out = compressor.compress(chunk, flush=True)
+            cpu_seconds += time.thread_time() - start
+            bytes_in += len(chunk)
+            bytes_out += len(out)
+            if out:
+                yield out
+
+        start = time.thread_time()
+        out = compressor.finish()
+        cpu_seconds += time.thread_time() - start
+        bytes_out += len(out)
+        yield out
+    finally:
+        compression_stats.record(encoding, bytes_in, bytes_out, cpu_seconds,
+                                 streamed=True)
+
+
+def compress_response(response):
+    """
+    Compressing the response body with the negotiated content coding
+    (after request). Streamed responses are compressed chunk by chunk,
+    other bodies only from `COMPRESS_MIN_SIZE` bytes. Strong ETags get the
+    content coding appended, see `coded_etag`
+    :param response: HTTP response
+    :return: HTTP response
+    """
+    if request.method == 'HEAD' or not _is_compressible(response):
+        return response
+
+    response.vary.add(ACCEPT_ENCODING)
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    compressor = COMPRESSORS[encoding]()
+    if response.is_streamed:
+        response.response = _compress_stream(response.iter_encoded(),
+                                             encoding, compressor)
+        response.headers.pop('Content-Length', None)
+        _set_encoding(response, encoding)
+        return response
+
+    data = response.get_data()
+    if len(data) < config.COMPRESS_MIN_SIZE:
+        return response
+
+    start = time.thread_time()
+    out = compressor.compress(data) + compressor.finish()
+    compression_stats.record(encoding, len(data), len(out),
+                             time.thread_time() - start)
+
+    response.set_data(out)
+    _set_encoding(response, encoding)
+    return response
+
+
+def init_compression(app):
+    """ Registering response compression on the app """
+    if app.config['COMPRESS_ENABLED']:
+        app.after_request(compress_response)
@@ -0,0 +1,116 @@
+""" Archival of soft deleted rows (PostgreSQL) """
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+import config
+from api.logger import get_logger
+
+from .base import Base
+
+logger = get_logger(__name__)  # pylint:disable=invalid-name
+
+ARCHIVE_SUFFIX = '_archive'
+
+
+def archivable_tables():
+    """
+    Tables with soft deletes, referencing tables first so their rows are
+    moved before the rows they point to
+    :return: list of Table
+    """
+    return [table for table in reversed(Base.metadata.sorted_tables)
+            if 'deleted_at' in table.c]
+
+
+def _create_archive_table(connection, table):
+    """
+    `<table>_archive` with the columns of the table, if it is missing.
+    Columns added to the table since are added to the archive too (NULL
+    for the rows archived before)
+    """
+    quote = connection.dialect.identifier_preparer.quote
+    archive = quote(table.name + ARCHIVE_SUFFIX)
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS {} (LIKE {} INCLUDING DEFAULTS)'.format(
+            archive, quote(table.name))))
+
+    for column in table.columns:
+        connection.execute(text(
+            'ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} {}'.format(
+                archive, quote(column.name),
+                column.type.compile(dialect=connection.dialect))))
+
+
+def _archive_statement(dialect, table):
+    """ Moving one batch of rows in a single statement """
+    quote = dialect.identifier_preparer.quote
+    # by name: the archive's column order differs once columns are added
+    columns = ', '.join(quote(column.name) for column in table.columns)
+    # SKIP LOCKED leaves rows being updated by requests for a later batch
+    return text('''
+        WITH moved AS (
+            DELETE FROM {table} WHERE ctid IN (
+                SELECT ctid FROM {table}
+                WHERE deleted_at < :cutoff
+                ORDER BY deleted_at
+                LIMIT :batch_size
+                FOR UPDATE SKIP LOCKED)
+            RETURNING {columns})
+        INSERT INTO {archive} ({columns}) SELECT {columns} FROM moved
+    '''.format(table=quote(table.name), columns=columns,
+               archive=quote(table.name + ARCHIVE_SUFFIX)))
+
+
+def archive_table(engine, table, days=config.ARCHIVE_AFTER_DAYS,
+                  batch_size=config.ARCHIVE_BATCH_SIZE,
+                  pause=config.ARCHIVE_PAUSE_SECONDS, max_batches=None):
+    """
+    Moving rows soft deleted more than `days` ago into `<table>_archive`,
+    `batch_size` rows per transaction with a `pause` between batches, so
+    locks stay short and replication/vacuum keep up
+    :param engine: Engine
+    :param table: Table
+    :param days: Integer - age of the soft delete
+    :param batch_size: Integer - rows per transaction
+    :param pause: Float - seconds to sleep between batches
+    :param max_batches: Integer - stop after this many batches
+    :return: Integer - number of archived rows
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    with engine.begin() as connection:
+        _create_archive_table(connection, table)
+    stmt = _archive_statement(engine.dialect, table)
+
+    archived, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        with engine.begin() as connection:
+            moved = connection.execute(
+                stmt, cutoff=cutoff, batch_size=batch_size).rowcount
+
+        archived += moved
+        batches += 1
+        logger.info('archived %s rows of %s', moved, table.name)
+
+        if moved < batch_size:
+            break
+        time.sleep(pause)
+
+    return archived
+
+
+def archive_all(engine, tables=None, **kwargs):
+    """
+    Archiving every soft deleting table, see `archive_table`
+    :param engine: Engine
+    :param tables: list of table names, all archivable tables by default
+    :return: dict of table name -> number of archived rows
+    """
+    result = {}
+    for table in archivable_tables():
+        if tables and table.name not in tables:
+            continue
+        result[table.name] = archive_table(engine, table, **kwargs)
+
+    return result
@@ -5,23 +5,29 @@ from sqlalchemy import inspect
 from sqlalchemy.ext.declarative import declarative_base
 from flask_sqlalchemy_session import current_session
 
-from .commit import commit
+from .commit import commit, on_commit
+from .serializers import get_serializer
 
 
 class Base:
     """ Base class """
     __serialize_attributes__ = ()
     __updatable_attributes__ = ()
+    __searchable_attributes__ = {}
+    # columns granting access: bulk updates of them call
+    # `after_bulk_access_change`
+    __access_attributes__ = ()
 
     def save(self, session=None):
         """ Save an object to the database """
         session = session if session else current_session
         session.add(self)
+        on_commit(self.after_commit, session)
         commit(session)
 
     def serialize(self):
         """ Return a JSON-serializable version of the object """
-        return {c: getattr(self, c) for c in self.__serialize_attributes__}
+        return get_serializer(type(self))(self)
 
     def as_dict(self):
         """ Return all attributes as JSON object """
@@ -38,13 +44,30 @@ class Base:
         """ Delete the object from the database """
         session = session if session else current_session
         setattr(self, 'deleted_at', datetime.utcnow())
+        on_commit(self.after_commit, session)
         commit(session)
 
     def force_delete(self, session=None):
         """ Delete the object permanently from the database """
         session = session if session else current_session
         session.delete(self)
+        on_commit(self.after_commit, session)
         commit(session)
 
+    def after_commit(self):
+        """ Hook called once the transaction of a `save`, `delete` or
+        `force_delete` is committed """
+
+    @classmethod
+    def after_bulk_delete(cls, uuids):
+        """ Hook called once the transaction of a bulk soft delete is
+        committed, with the deleted UUIDs """
+
+    @classmethod
+    def after_bulk_access_change(cls, uuids):
+        """ Hook called once the transaction of a bulk upsert is committed,
+        with the UUIDs of the updated rows whose `__access_attributes__`
+        changed """
+
 
 Base = declarative_base(cls=Base)  # pylint: disable=invalid-name
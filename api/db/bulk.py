@@ -0,0 +1,400 @@
+""" Bulk ingest (PostgreSQL `INSERT ... ON CONFLICT`) """
+from collections import OrderedDict
+from datetime import datetime
+from functools import partial
+from uuid import UUID, uuid4
+
+from sqlalchemy import (UniqueConstraint, and_, any_, bindparam, case, cast,
+                        inspect, literal_column, or_, select, tuple_, String)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import make_transient_to_detached
+from flask_sqlalchemy_session import current_session
+
+import config
+from api import strings
+from api.errors import APIError, DataConflictError
+
+from .commit import atomic, on_commit
+
+CONFLICT_IGNORE = 'ignore'
+CONFLICT_UPDATE = 'update'
+CONFLICT_FAIL = 'fail'
+
+
+class _Conflict(Exception):
+    """ Rolls back a `CONFLICT_FAIL` bulk upsert """
+
+
+class BulkResult:
+    """ Per-row outcome of `bulk_upsert`, as indexes into the input rows """
+
+    def __init__(self):
+        self.inserted = []
+        self.updated = []
+        self.skipped = []
+        self.conflicted = []
+        # UUIDs of updated rows whose `__access_attributes__` changed
+        self.access_changed = set()
+
+    def as_dict(self):
+        """ JSON-serializable outcome """
+        return dict(inserted=sorted(self.inserted),
+                    updated=sorted(self.updated),
+                    skipped=sorted(self.skipped),
+                    conflicted=sorted(self.conflicted))
+
+
+def get_unique_keys(table):
+    """
+    Unique constraints and unique indexes of the table (by name), then its
+    primary key. A partial unique index only covers the rows matching its
+    WHERE clause, which `ON CONFLICT` must repeat to infer the index
+    :param table: Table
+    :return: list of (tuple of column names, WHERE clause or None)
+    """
+    keys = [(constraint.name or '',
+             tuple(column.name for column in constraint.columns), None)
+            for constraint in table.constraints
+            if isinstance(constraint, UniqueConstraint)]
+    keys += [(index.name or '',
+              tuple(column.name for column in index.columns),
+              index.dialect_options['postgresql']['where'])
+             for index in table.indexes if index.unique]
+    keys.sort(key=lambda key: key[0])
+
+    primary_key = tuple(column.name for column in table.primary_key.columns)
+    return [(names, where) for _, names, where in keys] + [(primary_key, None)]
+
+
+def get_conflict_target(table):
+    """
+    Columns of the first (by name) unique constraint or unique index of the
+    table, or its primary key
+    :param table: Table
+    :return: tuple of column names
+    """
+    return get_unique_keys(table)[0][0]
+
+
+def get_conflict_where(table, target):
+    """
+    WHERE clause of the partial unique index on the `target` columns
+    :param table: Table
+    :param target: column names
+    :return: WHERE clause or None
+    """
+    for names, where in get_unique_keys(table):
+        if set(names) == set(target):
+            return where
+    return None
+
+
+def get_covering_conflict_target(table, keys):
+    """
+    Columns of a unique constraint or index (or the primary key) whose
+    columns are all in `keys`, i.e. a key an INSERT of `keys` could conflict
+    on
+    :param table: Table
+    :param keys: column names
+    :return: tuple of column names or None
+    """
+    keys = set(keys)
+    for names, _ in get_unique_keys(table):
+        if names and set(names) <= keys:
+            return names
+
+    return None
+
+
+def insert_or_get(cls, values, conflict_target, session=None):
+    """
+    Inserting a row with `INSERT ... ON CONFLICT DO NOTHING RETURNING *`,
+    selecting the existing row by `conflict_target` only on conflict.
+    Race-free: concurrent callers get the same row
+    :param cls: (Base) Model class
+    :param values: dict of column values
+    :param conflict_target: column names of a unique key in `values`
+    :return: (instance, created)
+    :raises: DataConflictError if the existing row is soft deleted
+    """
+    session = session if session else current_session
+    table = cls.__table__
+    where = get_conflict_where(table, conflict_target)
+    stmt = pg_insert(table).values(**values) \
+        .on_conflict_do_nothing(index_elements=conflict_target,
+                                index_where=where) \
+        .returning(*table.columns)
+
+    with atomic(session):
+        row = session.execute(stmt).first()
+        if row is not None:
+            mapper = inspect(cls)
+            instance = cls(**{mapper.get_property_by_column(column).key:
+                              row[column] for column in table.columns})
+            # the row is in the database already: attached as persistent,
+            # without pending changes, once committed
+            make_transient_to_detached(instance)
+            on_commit(instance.after_commit, session)
+
+    if row is not None:
+        session.add(instance)
+        return instance, True
+
+    query = session.query(cls).filter_by(
+        **{name: values[name] for name in conflict_target})
+    # soft deleted rows are outside of a live-rows unique index
+    instance = (query.filter(where) if where is not None else query).one()
+    if getattr(instance, 'deleted_at', None) is not None:
+        raise DataConflictError(strings.DELETED_RECORD_EXISTS.format(
+            cls.__name__, ', '.join(conflict_target)))
+
+    return instance, False
+
+
+def _row_key(row, target):
+    """ Conflict key of a row, None if any part is NULL (can't conflict) """
+    key = tuple(row.get(name) for name in target)
+    return None if None in key else tuple(str(value) for value in key)
+
+
+def bulk_upsert(cls, rows, on_conflict=CONFLICT_FAIL, conflict_target=None,
+                chunk_size=config.BULK_CHUNK_SIZE, session=None):
+    """
+    Inserting rows with multi-row `INSERT ... ON CONFLICT` statements,
+    `chunk_size` rows per statement, in a single transaction
+    - ignore: conflicting rows are skipped
+    - update: rows conflicting on the target update their
+      `__updatable_attributes__`, rows conflicting on another unique key
+      are conflicted
+    - fail: nothing is written if any row conflicts
+    :param cls: (Base) Model class
+    :param rows: list of dicts of column values
+    :param on_conflict: CONFLICT_IGNORE|CONFLICT_UPDATE|CONFLICT_FAIL
+    :param conflict_target: column names, see `get_conflict_target`
+    :param chunk_size: Integer - rows per statement
+    :return: BulkResult
+    """
+    session = session if session else current_session
+    table = cls.__table__
+    target = tuple(conflict_target or get_conflict_target(table))
+    result = BulkResult()
+
+    rows = [dict(row) for row in rows]
+    groups = OrderedDict()
+    keys = [target] + [names for names, _ in get_unique_keys(table)
+                       if set(names) != set(target)]
+    seen = {names: set() for names in keys}
+
+    for index, row in enumerate(rows):
+        if set(row) - set(table.columns.keys()):
+            raise APIError(strings.INVALID_PAYLOAD)
+
+        row.setdefault('uuid', uuid4())
+
+        # a key repeated within the payload would conflict with itself;
+        # an update only resolves a repeated target
+        row_keys = {names: _row_key(row, names) for names in keys}
+        repeated = [names for names, key in row_keys.items()
+                    if key is not None and key in seen[names]]
+        if repeated:
+            if on_conflict == CONFLICT_IGNORE or (
+                    on_conflict == CONFLICT_UPDATE and repeated == [target]):
+                result.skipped.append(index)
+            else:
+                result.conflicted.append(index)
+            continue
+        for names, key in row_keys.items():
+            seen[names].add(key)
+
+        # multi-row VALUES need the same columns in every row
+        groups.setdefault(frozenset(row), []).append(index)
+
+    try:
+        with atomic(session):
+            for indexes in groups.values():
+                for start in range(0, len(indexes), chunk_size):
+                    chunk = indexes[start:start + chunk_size]
+                    _upsert_chunk(session, cls, rows, chunk, on_conflict,
+                                  target, result)
+
+            if on_conflict == CONFLICT_FAIL and result.conflicted:
+                raise _Conflict()
+
+            if result.access_changed:
+                on_commit(partial(cls.after_bulk_access_change,
+                                  result.access_changed), session)
+    except _Conflict:
+        result.inserted = []
+
+    return result
+
+
+def _key_conflicts(session, table, rows, indexes, target):
+    """
+    Rows conflicting with another live row on a unique key other than
+    `target`: `ON CONFLICT DO UPDATE` only resolves conflicts on its target,
+    any other one fails the whole statement
+    :return: set of indexes into `rows`
+    """
+    conflicts = set()
+    for names, where in get_unique_keys(table):
+        if set(names) == set(target):
+            continue
+
+        candidates = {}
+        for index in indexes:
+            key = _row_key(rows[index], names)
+            if key is not None:
+                candidates.setdefault(key, []).append(index)
+        if not candidates:
+            continue
+
+        columns = [table.c[name] for name in names]
+        query = select(columns + [table.c[name] for name in target]).where(
+            tuple_(*columns).in_(
+                [tuple(rows[index][name] for name in names)
+                 for index in indexes
+                 if _row_key(rows[index], names) is not None]))
+        if where is not None:
+            query = query.where(where)
+
+        for existing in map(dict, session.execute(query)):
+            for index in candidates.get(_row_key(existing, names), ()):
+                # the row the update targets may keep its own key
+                if _row_key(existing, target) != _row_key(rows[index],
+                                                          target):
+                    conflicts.add(index)
+
+    return conflicts
+
+
+def _upsert_statement(cls, values, on_conflict, target):
+    """ Multi-row INSERT ... ON CONFLICT ... RETURNING statement """
+    table = cls.__table__
+    stmt = pg_insert(table).values(values)
+    now = datetime.utcnow()
+    returning = []
+
+    updatable = [name for name in cls.__updatable_attributes__
+                 if name in values[0] and name not in target]
+
+    if on_conflict == CONFLICT_UPDATE and updatable:
+        set_ = {name: stmt.excluded[name] for name in updatable}
+        if 'updated_at' in table.c:
+            set_['updated_at'] = now
+        if 'version_id' in table.c:
+            set_['version_id'] = table.c.version_id + 1
+
+        access = [name for name in cls.__access_attributes__
+                  if name in updatable]
+        if access and 'access_changed_at' in table.c:
+            # token revocation of the other processes, see `api.revocation`
+            set_['access_changed_at'] = case(
+                [(or_(*[table.c[name].is_distinct_from(stmt.excluded[name])
+                        for name in access]), now)],
+                else_=table.c.access_changed_at)
+            returning.append(
+                (table.c.access_changed_at == now).label('access_changed'))
+
+        stmt = stmt.on_conflict_do_update(
+            index_elements=target,
+            index_where=get_conflict_where(table, target), set_=set_)
+    else:
+        # any unique key, not only the target
+        stmt = stmt.on_conflict_do_nothing()
+
+    # xmax is 0 only for freshly inserted rows
+    return stmt.returning(table.c.uuid,
+                          literal_column('(xmax = 0)').label('is_insert'),
+                          *[table.c[name] for name in target] + returning)
+
+
+def _upsert_chunk(session, cls, rows, indexes, on_conflict, target, result):
+    """ One multi-row INSERT ... ON CONFLICT ... RETURNING statement """
+    if on_conflict == CONFLICT_UPDATE:
+        conflicts = _key_conflicts(session, cls.__table__, rows, indexes,
+                                   target)
+        result.conflicted.extend(sorted(conflicts))
+        indexes = [index for index in indexes if index not in conflicts]
+        if not indexes:
+            return
+
+    stmt = _upsert_statement(cls, [rows[index] for index in indexes],
+                             on_conflict, target)
+
+    inserted, updated = set(), set()
+    for row in session.execute(stmt):
+        if row.is_insert:
+            inserted.add(str(row.uuid))
+        else:
+            updated.add(tuple(str(row[name]) for name in target))
+            if 'access_changed' in row.keys() and row.access_changed:
+                result.access_changed.add(row.uuid)
+
+    for index in indexes:
+        if str(rows[index]['uuid']) in inserted:
+            result.inserted.append(index)
+        elif _row_key(rows[index], target) in updated:
+            result.updated.append(index)
+        elif on_conflict == CONFLICT_FAIL:
+            result.conflicted.append(index)
+        else:
+            result.skipped.append(index)
+
+
+def parse_uuids(values):
+    """
+    Split raw uuid values into valid (deduplicated, in order) and invalid
+    :param values: iterable of uuid strings or UUIDs
+    :return: (OrderedDict UUID -> raw value, list of invalid raw values)
+    """
+    valid, invalid = OrderedDict(), []
+    for value in values:
+        try:
+            uuid = value if isinstance(value, UUID) else UUID(str(value))
+        except ValueError:
+            invalid.append(value)
+            continue
+        valid.setdefault(uuid, value)
+
+    return valid, invalid
+
+
+def bulk_soft_delete(cls, uuids, chunk_size=config.DELETE_BULK_CHUNK_SIZE,
+                     session=None):
+    """
+    Soft deleting rows with one
+    `UPDATE ... WHERE uuid = ANY(:uuids) AND deleted_at IS NULL RETURNING uuid`
+    statement per `chunk_size` ids. Run it inside `atomic` to make the
+    chunks all-or-nothing.
+    :param cls: (Base) Model class
+    :param uuids: list of UUIDs
+    :param chunk_size: Integer - ids per statement
+    :return: set of the UUIDs that were deleted
+    """
+    session = session if session else current_session
+    table = cls.__table__
+    uuids = list(uuids)
+
+    # a single array parameter keeps the statement text (and plan) stable
+    # whatever the number of ids, unlike an IN list
+    ids = cast(bindparam('uuids', type_=postgresql.ARRAY(String)),
+               postgresql.ARRAY(postgresql.UUID))
+    now = datetime.utcnow()
+    values = dict(deleted_at=now, version_id=table.c.version_id + 1)
+    if 'access_changed_at' in table.c:
+        # token revocation of the other processes, see `api.revocation`
+        values['access_changed_at'] = now
+    stmt = table.update() \
+        .where(and_(table.c.uuid == any_(ids), table.c.deleted_at.is_(None))) \
+        .values(**values) \
+        .returning(table.c.uuid)
+
+    deleted = set()
+    for start in range(0, len(uuids), chunk_size):
+        chunk = [str(uuid) for uuid in uuids[start:start + chunk_size]]
+        deleted.update(row.uuid for row in
+                       session.execute(stmt, {'uuids': chunk}))
+
+    return deleted
@@ -1,11 +1,160 @@
 """ commit function """
+from functools import wraps
+
+from sqlalchemy import event
 from sqlalchemy.exc import IntegrityError, StatementError, SQLAlchemyError
+from sqlalchemy.orm import Session, scoped_session
+from flask_sqlalchemy_session import current_session
+from werkzeug.local import LocalProxy
+
+_ATOMIC_KEY = 'atomic_blocks'
+_ON_COMMIT_KEY = 'on_commit'
+
+
+def unwrap_session(session=None):
+    """
+    The `Session` behind a scoped session proxy such as `current_session`,
+    for APIs that need the session itself (baked queries, transactions)
+    :param session: Session|scoped_session, `current_session` by default
+    :return: Session
+    """
+    session = session if session else current_session
+    if isinstance(session, LocalProxy):
+        session = session._get_current_object()  # pylint:disable=protected-access
+    return session() if isinstance(session, scoped_session) else session
+
+
+def _boundary(transaction):
+    """ Closest enclosing transaction that commits for real (root or
+    SAVEPOINT) """
+    while not (transaction.nested or transaction.parent is None):
+        transaction = transaction.parent
+    return transaction
+
+
+def on_commit(func, session=None):
+    """
+    Run `func` once the session's current transaction is committed to the
+    database: inside an `atomic` block (or a request transaction) `commit`
+    only flushes, hooks wait for the real COMMIT. Hooks of a transaction
+    (or SAVEPOINT) that is rolled back are dropped
+    :param func: callable without arguments
+    :param session: SQLAlchemy session
+    """
+    session = unwrap_session(session)
+    if session.transaction is None:
+        func()
+        return
+
+    boundary = _boundary(session.transaction)
+    hooks = session.info.setdefault(_ON_COMMIT_KEY, [])
+    if not any(owner is boundary and hook == func for owner, hook in hooks):
+        hooks.append((boundary, func))
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_on_commit(session):
+    """ Running the hooks of a committed transaction """
+    transaction = session.transaction
+    hooks = session.info.get(_ON_COMMIT_KEY)
+    if not hooks:
+        return
+
+    if transaction is not None and transaction.nested:
+        # a released SAVEPOINT hands its hooks over to the outer transaction
+        parent = _boundary(transaction.parent)
+        session.info[_ON_COMMIT_KEY] = [
+            (parent if owner is transaction else owner, hook)
+            for owner, hook in hooks]
+        return
+
+    del session.info[_ON_COMMIT_KEY]
+    for _, hook in hooks:
+        hook()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_on_commit(session, previous_transaction):
+    """ Dropping the hooks of a rolled back transaction """
+    hooks = session.info.get(_ON_COMMIT_KEY)
+    if not hooks:
+        return
+
+    if previous_transaction.nested:
+        session.info[_ON_COMMIT_KEY] = [
+            (owner, hook) for owner, hook in hooks
+            if owner is not previous_transaction]
+    elif previous_transaction.parent is None:
+        del session.info[_ON_COMMIT_KEY]
+
+
+def in_atomic(session):
+    """ Whether the session is inside an `atomic` block """
+    return bool(session.info.get(_ATOMIC_KEY))
 
 
 def commit(session):
-    """ Commit the session or rollback and raise the error """
+    """ Commit the session or rollback and raise the error.
+    Inside an `atomic` block changes are only flushed (errors still raise),
+    the outermost block commits or rolls back once """
     try:
-        session.commit()
+        if in_atomic(session):
+            session.flush()
+        else:
+            session.commit()
     except (IntegrityError, StatementError, SQLAlchemyError) as error:
-        session.rollback()
+        if not in_atomic(session):
+            session.rollback()
         raise error  # this should be handled in the view
+
+
+class atomic:  # pylint:disable=invalid-name
+    """ Unit of work, as a context manager or decorator.
+
+    `save`/`delete`/`commit` inside the block only flush; the outermost
+    block issues a single COMMIT, or a ROLLBACK if the block raises.
+    Nested blocks run in a SAVEPOINT, so they can fail on their own """
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def __call__(self, func):
+        @wraps(func)
+        def decorated_function(*args, **kwargs):
+            """ run `func` inside the block """
+            with atomic(self.session):
+                return func(*args, **kwargs)
+
+        return decorated_function
+
+    def _get_session(self):
+        return self.session if self.session else current_session
+
+    def begin(self):
+        """ Enter the block """
+        session = self._get_session()
+        blocks = session.info.setdefault(_ATOMIC_KEY, [])
+        blocks.append(session.begin_nested() if blocks else None)
+        return session
+
+    def end(self, failed=False):
+        """ Leave the block: release/commit, or rollback if `failed` """
+        session = self._get_session()
+        savepoint = session.info[_ATOMIC_KEY].pop()
+
+        if savepoint is not None:
+            if failed:
+                savepoint.rollback()
+            else:
+                savepoint.commit()
+        elif failed:
+            session.rollback()
+        else:
+            commit(session)
+
+    def __enter__(self):
+        return self.begin()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end(failed=exc_type is not None)
+        return False
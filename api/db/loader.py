@@ -0,0 +1,172 @@
+""" Request-scoped batch loader """
+from collections import defaultdict
+from contextlib import contextmanager
+from uuid import UUID
+
+from flask import g, has_app_context
+from sqlalchemy import inspect
+
+from api.errors import NotFoundError
+
+from .util import fetch_by_ids
+
+_G_KEY = 'batch_loader'
+
+
+class BatchLoader:
+    """
+    Coalesces `fetch`-style lookups: uuids queued with `prime` or requested
+    through `load`/`load_many` are fetched with a single `IN (...)` query
+    per model, de-duplicated and memoized.
+    Lookups are synchronous: `load` dispatches at once, so a batch only
+    spans the uuids queued before it. Callers resolving several objects
+    `prime` them all first (or use `load_many`); a lone `load` is a plain
+    `fetch`, memoized for the rest of the request.
+    A batch fetched with `fields` loads only those columns; the others are
+    loaded on first access, like any deferred column
+    """
+
+    def __init__(self, session=None):
+        self.session = session
+        self._pending = defaultdict(set)
+        self._loaded = defaultdict(dict)
+
+    @staticmethod
+    def _key(uuid):
+        return uuid if isinstance(uuid, UUID) else UUID(str(uuid))
+
+    def prime(self, cls, uuids):
+        """
+        Queue uuids to be fetched with the next batch of `cls`
+        :param cls: (Base) Model class
+        :param uuids: list of ids
+        """
+        loaded = self._loaded[cls]
+        self._pending[cls].update(key for key in map(self._key, uuids)
+                                  if key not in loaded)
+
+    def dispatch(self, cls, fields=None):
+        """
+        Fetch every queued uuid of `cls` in one query
+        :param cls: (Base) Model class
+        :param fields: field names to load, every column by default
+        """
+        keys = self._pending.pop(cls, None)
+        if not keys:
+            return
+
+        loaded = self._loaded[cls]
+        for key in keys:
+            loaded[key] = None
+
+        for obj in fetch_by_ids(cls, list(keys), session=self.session,
+                                fields=fields):
+            loaded[obj.uuid] = obj
+
+    def load(self, cls, uuid, fields=None):
+        """
+        Same contract as `fetch`, batched with every uuid of `cls` queued so
+        far; the query runs now, unless `uuid` is memoized already
+        :param cls: (Base) Model class
+        :param uuid: UUID|string
+        :param fields: field names to load, every column by default
+        :return: object of the specified class
+        :raises: NotFoundError
+        """
+        return self.load_many(cls, [uuid], fields=fields)[0]
+
+    def load_many(self, cls, uuids, fields=None):
+        """
+        Objects for all `uuids`, in order, fetched in at most one query
+        :param cls: (Base) Model class
+        :param uuids: list of ids
+        :param fields: field names to load, every column by default
+        :return: object list of the specified class
+        :raises: NotFoundError if any uuid is missing
+        """
+        keys = [self._key(uuid) for uuid in uuids]
+        self.prime(cls, keys)
+        self.dispatch(cls, fields=fields)
+
+        loaded = self._loaded[cls]
+        result = []
+        for key in keys:
+            obj = loaded.get(key)
+            if obj is None or _is_deleted(obj):
+                raise NotFoundError('{} not found'.format(cls.__name__))
+            result.append(obj)
+
+        return result
+
+    def clear(self, cls=None):
+        """ Forget memoized objects (of `cls`, or all) """
+        if cls is None:
+            self._pending.clear()
+            self._loaded.clear()
+        else:
+            self._pending.pop(cls, None)
+            self._loaded.pop(cls, None)
+
+
+def _is_deleted(obj):
+    """ Deleted since it was loaded, checked without refreshing it """
+    state = inspect(obj)
+    return state.was_deleted or state.dict.get('deleted_at') is not None
+
+
+def get_loader():
+    """
+    Batch loader of the current request, memoized in `flask.g`
+    :return: BatchLoader
+    """
+    loader = g.get(_G_KEY)
+    if loader is None:
+        loader = BatchLoader()
+        setattr(g, _G_KEY, loader)
+    return loader
+
+
+def clear_loader(_exception=None):
+    """ Drop the request's batch loader (teardown) """
+    if has_app_context():
+        g.pop(_G_KEY, None)
+
+
+@contextmanager
+def batch_scope(session=None):
+    """
+    Explicit batch scope, e.g. outside of a request. Inside an app context
+    it replaces the request loader while active
+    :param session: SQLAlchemy session
+    :return: BatchLoader
+    """
+    loader = BatchLoader(session)
+
+    if not has_app_context():
+        yield loader
+        return
+
+    previous = g.get(_G_KEY)
+    setattr(g, _G_KEY, loader)
+    try:
+        yield loader
+    finally:
+        setattr(g, _G_KEY, previous)
+
+
+def prime(cls, uuids):
+    """
+    Queue uuids on the current loader, fetched together by the next `load`
+    of `cls`, see `BatchLoader.prime`
+    """
+    get_loader().prime(cls, uuids)
+
+
+def load(cls, uuid, fields=None):
+    """ `fetch` through the current loader, see `BatchLoader.load` """
+    return get_loader().load(cls, uuid, fields=fields)
+
+
+def load_many(cls, uuids, fields=None):
+    """ Objects for all `uuids` through the current loader """
+    return get_loader().load_many(cls, uuids, fields=fields)
@@ -0,0 +1,62 @@
+""" Instrumented connection pool """
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    `QueuePool` recording how long checkouts wait for a connection, how
+    many time out, and the peak number of connections in use
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(InstrumentedQueuePool, self).__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.peak_in_use = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.monotonic()
+        try:
+            connection = super(InstrumentedQueuePool, self)._do_get()
+            with self._stats_lock:
+                self.checkouts += 1
+                self.peak_in_use = max(self.peak_in_use, self.checkedout())
+            return connection
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            with self._stats_lock:
+                self.wait_seconds += elapsed
+                self.max_wait_seconds = max(self.max_wait_seconds, elapsed)
+
+    def stats(self):
+        """ Pool usage and checkout wait """
+        checkouts = self.checkouts or 1
+        return dict(size=self.size(), in_use=self.checkedout(),
+                    idle=self.checkedin(), overflow=max(self.overflow(), 0),
+                    max_overflow=self._max_overflow,
+                    peak_in_use=self.peak_in_use, checkouts=self.checkouts,
+                    timeouts=self.timeouts,
+                    avg_wait_ms=round(self.wait_seconds * 1000 / checkouts,
+                                      2),
+                    max_wait_ms=round(self.max_wait_seconds * 1000, 2))
+
+
+def pool_stats(engines):
+    """
+    Stats of the pools of `engines`
+    :param engines: dict of name -> Engine
+    :return: dict of name -> stats
+    """
+    return {name: engine.pool.stats() for name, engine in engines.items()
+            if isinstance(engine.pool, InstrumentedQueuePool)}
@@ -0,0 +1,159 @@
+""" Index-backed search """
+from sqlalchemy import Index, event, func, text
+from sqlalchemy.schema import CreateIndex
+from flask_sqlalchemy_session import current_session
+
+import config
+from api.logger import get_logger
+
+from .base import Base
+
+logger = get_logger(__name__)  # pylint:disable=invalid-name
+
+SEARCH_SUBSTRING = 'substring'
+SEARCH_PREFIX = 'prefix'
+
+TRIGRAM_EXTENSION = 'pg_trgm'
+# engine url -> whether pg_trgm is installed
+_TRIGRAM_INSTALLED = {}
+
+
+@event.listens_for(Base.metadata, 'before_create')
+def _create_trigram_extension(_metadata, connection, **_kwargs):
+    """ pg_trgm is created before any table when the server provides it.
+    Without it the trigram indexes are not created (see
+    `_trigram_installed`) and searches run unindexed """
+    if connection.dialect.name != 'postgresql':
+        return
+
+    available = connection.execute(text(
+        'SELECT 1 FROM pg_available_extensions WHERE name = :name'),
+                                   name=TRIGRAM_EXTENSION).first()
+    if available:
+        connection.execute(text('CREATE EXTENSION IF NOT EXISTS {}'.format(
+            TRIGRAM_EXTENSION)))
+    else:
+        logger.warning('%s is not available, trigram indexes are not '
+                       'created', TRIGRAM_EXTENSION)
+
+
+def _trigram_installed(_ddl, _target, bind, **_kwargs):
+    """ `execute_if` condition of the trigram indexes, per connection """
+    return bind.execute(text(
+        'SELECT 1 FROM pg_extension WHERE extname = :name'),
+                        name=TRIGRAM_EXTENSION).first() is not None
+
+
+def has_trigram(session):
+    """
+    Whether pg_trgm is installed in the session's PostgreSQL database
+    (checked once per engine)
+    :param session: SQLAlchemy session
+    :return: bool
+    """
+    engine = session.get_bind()
+    if engine.dialect.name != 'postgresql':
+        return False
+
+    key = str(engine.url)
+    if key not in _TRIGRAM_INSTALLED:
+        _TRIGRAM_INSTALLED[key] = engine.execute(text(
+            'SELECT 1 FROM pg_extension WHERE extname = :name'),
+                                                 name=TRIGRAM_EXTENSION) \
+            .first() is not None
+
+    return _TRIGRAM_INSTALLED[key]
+
+
+def add_search_indexes(table, searchable):
+    """
+    Declaring the indexes backing `search` for the searchable columns:
+    - substring: pg_trgm GIN index, used by `ILIKE '%value%'` and by
+      `ILIKE 'value%'` prefix searches. It is created after its table, on
+      PostgreSQL servers with pg_trgm only, so it isn't in `table.indexes`
+    - prefix: `lower(column) text_pattern_ops`, used by `LIKE 'value%'`
+    Other dialects get plain prefix indexes
+    :param table: Table
+    :param searchable: dict of column name -> search mode
+    """
+    for name, mode in searchable.items():
+        column = table.c[name]
+
+        if mode == SEARCH_PREFIX:
+            label = '{}_lower'.format(name)
+            Index('ix_{}_{}_prefix'.format(table.name, name),
+                  func.lower(column).label(label),
+                  postgresql_ops={label: 'text_pattern_ops'})
+        else:
+            index = Index('ix_{}_{}_trgm'.format(table.name, name), column,
+                          postgresql_using='gin',
+                          postgresql_ops={name: 'gin_trgm_ops'},
+                          postgresql_where=table.c.deleted_at.is_(None)
+                          if 'deleted_at' in table.c else None)
+            table.indexes.discard(index)
+            event.listen(table, 'after_create', CreateIndex(index).execute_if(
+                dialect='postgresql', callable_=_trigram_installed))
+
+
+def _escape_like(value):
+    """ Escaping LIKE wildcards in user input """
+    return value.replace('/', '//').replace('%', '/%').replace('_', '/_')
+
+
+def search(cls, field, value, order_by=None, limit=None, mode=None,
+           session=None):
+    """
+    Searching `cls` rows whose `field` contains `value`, or starts with it
+    in `SEARCH_PREFIX` mode.
+    On PostgreSQL with pg_trgm, substring matches use the trigram index, are
+    capped at the `SEARCH_CANDIDATE_LIMIT` most similar candidates and
+    ranked by similarity unless `order_by` is given. Otherwise they fall back to
+    `lower(field) LIKE`
+    :param cls: (Base) Model class
+    :param field: model attribute
+    :param value: string
+    :param order_by: ordering
+    :param limit: int
+    :param mode: SEARCH_SUBSTRING (default)|SEARCH_PREFIX
+    :return: object list of the specified class
+    """
+    session = session if session else current_session
+    query = session.query(cls).filter_by(deleted_at=None)
+
+    if not value:
+        if order_by is not None:
+            query = query.order_by(order_by)
+        return (query.limit(limit) if limit else query).all()
+
+    pattern = _escape_like(value.lower())
+
+    if mode == SEARCH_PREFIX:
+        if cls.__searchable_attributes__.get(field.key) == SEARCH_PREFIX:
+            # backed by the `lower(field) text_pattern_ops` index
+            query = query.filter(func.lower(field).like(pattern + '%',
+                                                        escape='/'))
+        else:
+            # backed by the trigram index, if any
+            query = query.filter(field.ilike(pattern + '%', escape='/'))
+        query = query.order_by(order_by if order_by is not None else field)
+    elif has_trigram(session):
+        # the best matches, not the first ones found, make the cut
+        candidates = session.query(cls.uuid) \
+            .filter(cls.deleted_at.is_(None),
+                    field.ilike('%' + pattern + '%', escape='/')) \
+            .order_by(func.similarity(field, value).desc()) \
+            .limit(config.SEARCH_CANDIDATE_LIMIT) \
+            .subquery()
+        query = query.filter(cls.uuid.in_(candidates))
+        query = query.order_by(order_by if order_by is not None
+                               else func.similarity(field, value).desc())
+    else:
+        query = query.filter(func.lower(field).contains(value.lower(),
+                                                        autoescape=True))
+        if order_by is not None:
+            query = query.order_by(order_by)
+
+    if limit:
+        query = query.limit(limit)
+
+    return query.all()
@@ -1,6 +1,8 @@
 """ Serialize Class"""
 from api.models import BaseModel
 
+from .serializers import serialize_many
+
 
 class Serialize:
     """ Serialize class for all serializing methods """
@@ -12,7 +14,7 @@ class Serialize:
         :param object_list: Model object list
         :return: JSON
         """
-        return [item.serialize() for item in object_list]
+        return serialize_many(object_list)
 
     @staticmethod
     def serialize_nested(_object):
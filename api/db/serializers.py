@@ -0,0 +1,150 @@
+""" Precompiled per-model serializers """
+import datetime
+import enum
+from decimal import Decimal
+from operator import attrgetter
+from uuid import UUID
+
+from sqlalchemy import Date, DateTime, Enum, Numeric, event, inspect
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapper
+from sqlalchemy_utils import UUIDType
+
+_SERIALIZERS = {}
+
+
+def _uuid(value):
+    return None if value is None else str(value)
+
+
+def _datetime(value):
+    return None if value is None else value.isoformat(timespec='milliseconds')
+
+
+def _date(value):
+    return None if value is None else value.isoformat()
+
+
+def _numeric(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _enum(value):
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def _any(value):
+    """ Same output as `JSONEncoder` for a value of unknown type """
+    if isinstance(value, datetime.datetime):
+        return _datetime(value)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def get_converter(column_type):
+    """
+    Converter of column values to JSON-serializable values, `None` when
+    the values already are
+    :param column_type: TypeEngine
+    :return: callable or None
+    """
+    if isinstance(column_type, (UUIDType, PG_UUID)):
+        return _uuid
+    if isinstance(column_type, DateTime):
+        return _datetime
+    if isinstance(column_type, Date):
+        return _date
+    if isinstance(column_type, Enum):
+        return _enum
+    # Float columns already return floats
+    if isinstance(column_type, Numeric) and column_type.asdecimal:
+        return _numeric
+    try:
+        if column_type.python_type in (int, float, str, bool):
+            return None
+    except NotImplementedError:
+        pass
+    return _any
+
+
+def _build(cls, fields):
+    """ Serializer of `fields` of `cls` objects """
+    columns = inspect(cls).columns
+    fields = tuple(fields)
+    converters = []
+    for field in fields:
+        column = columns.get(field)
+        # non-column attributes (properties, relationships) of any type
+        converters.append(_any if column is None
+                          else get_converter(column.type))
+
+    if not fields:
+        return lambda obj: {}
+
+    getter = attrgetter(*fields)
+    pairs = tuple(zip(fields, converters))
+
+    if len(fields) == 1:
+        field, converter = pairs[0]
+        if converter is None:
+            return lambda obj: {field: getter(obj)}
+        return lambda obj: {field: converter(getter(obj))}
+
+    def serialize(obj):
+        return {field: value if converter is None else converter(value)
+                for (field, converter), value in zip(pairs, getter(obj))}
+
+    return serialize
+
+
+def get_serializer(cls, fields=None):
+    """
+    Serializer of `cls` objects, built once per (class, fields): values are
+    read with a single `attrgetter` and converted by a converter chosen
+    from the column type
+    :param cls: (Base) Model class
+    :param fields: attribute names, `__serialize_attributes__` by default
+    :return: callable obj -> dict
+    """
+    key = (cls, None if fields is None else tuple(fields))
+    serializer = _SERIALIZERS.get(key)
+    if serializer is None:
+        serializer = _SERIALIZERS[key] = _build(
+            cls, cls.__serialize_attributes__ if fields is None else fields)
+
+    return serializer
+
+
+def serialize_many(objects, fields=None):
+    """
+    Serializing a list of model objects
+    :param objects: list of Model objects
+    :param fields: attribute names, `__serialize_attributes__` by default
+    :return: list of dicts
+    """
+    result = []
+    last_cls, serializer = None, None
+    for obj in objects:
+        cls = type(obj)
+        if cls is not last_cls:
+            # `serialize` overrides are honoured for default fields
+            last_cls = cls
+            serializer = cls.serialize if fields is None \
+                else get_serializer(cls, fields)
+        result.append(serializer(obj))
+
+    return result
+
+
+@event.listens_for(Mapper, 'mapper_configured')
+def _compile_serializer(mapper, cls):
+    """ Building the default serializer along with the mapper """
+    if mapper.columns and hasattr(cls, '__serialize_attributes__'):
+        get_serializer(cls)
@@ -1,15 +1,130 @@
 """ Session Manager """
 # pylint: disable=invalid-name
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import random
 
-from config import DB_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy_session import current_session
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.expression import Select, TextClause
 
-from api import serializer
+from config import (DB_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_REPLICA_URLS,
+                    DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+                    DB_STATEMENT_TIMEOUT_MS)
 
-engine_options = dict(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+from api import metrics, serializer
+
+from .pool import InstrumentedQueuePool, pool_stats
+
+_PRIMARY_KEY = 'use_primary'
+_REPLICA_KEY = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+
+
+def _is_read(clause):
+    """ Whether a statement only reads (and locks nothing) """
+    if isinstance(clause, Select):
+        return clause._for_update_arg is None  # pylint:disable=protected-access
+    if isinstance(clause, TextClause):
+        sql = clause.text.lstrip().lower()
+        return sql.startswith('select') and 'for update' not in sql \
+            and 'for share' not in sql
+    return False
+
+
+class RoutingSession(Session):
+    """
+    Session sending the reads of GET/HEAD requests to a replica.
+    Everything else goes to the primary: writes, reads outside such
+    requests, and every statement after the first write (or after
+    `use_primary`) of the session, so a request reads its own writes.
+    Replicas lag behind the primary: paths that must see writes of
+    previous requests should call `use_primary`
+    """
+
+    def __init__(self, replicas=(), **kwargs):
+        self.replicas = list(replicas)
+        super(RoutingSession, self).__init__(**kwargs)
+
+    def _use_replica(self, clause):
+        if not self.replicas or self.info.get(_PRIMARY_KEY):
+            return False
+        if not (has_request_context() and request.method in READ_METHODS):
+            return False
+        return _is_read(clause)
+
+    def get_bind(self, mapper=None, clause=None):
+        """
+        Engine of a statement: a replica for the reads of GET/HEAD requests,
+        the primary otherwise
+        :param mapper: Mapper of the statement's entity
+        :param clause: statement
+        :return: Engine
+        """
+        if self._use_replica(clause):
+            # one replica per session keeps reads of a request consistent
+            if _REPLICA_KEY not in self.info:
+                self.info[_REPLICA_KEY] = random.choice(self.replicas)
+            return self.info[_REPLICA_KEY]
+
+        if self._flushing or (clause is not None and not _is_read(clause)):
+            self.info[_PRIMARY_KEY] = True
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _pin_primary(session, _flush_context):
+    """ Reads after a write go to the primary """
+    session.info[_PRIMARY_KEY] = True
+
+
+def get_statement_timeout():
+    """
+    `statement_timeout` (ms) of the current route, see `Blueprint.route`,
+    else `DB_STATEMENT_TIMEOUT_MS`
+    :return: Integer, 0 means no timeout
+    """
+    timeout = None
+    if has_request_context() and request.endpoint:
+        view = current_app.view_functions.get(request.endpoint)
+        timeout = getattr(view, 'statement_timeout', None)
+
+    return int(timeout if timeout is not None else DB_STATEMENT_TIMEOUT_MS)
+
+
+@event.listens_for(RoutingSession, 'after_begin')
+def _set_statement_timeout(_session, _transaction, connection):
+    """ Applying the route's statement timeout to the new transaction """
+    timeout = get_statement_timeout()
+    if timeout and connection.dialect.name == 'postgresql':
+        # SET LOCAL ends with the transaction, the pooled connection is clean
+        connection.execute('SET LOCAL statement_timeout = {:d}'.format(timeout))
+
+
+def use_primary(session=None):
+    """
+    Sending every further statement of the session (request) to the primary
+    :param session: SQLAlchemy session
+    """
+    session = session if session else current_session
+    session.info[_PRIMARY_KEY] = True
+
+
+engine_options = dict(poolclass=InstrumentedQueuePool,
+                      pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                      pool_timeout=DB_POOL_TIMEOUT,
+                      pool_recycle=DB_POOL_RECYCLE,
+                      pool_pre_ping=DB_POOL_PRE_PING,
                       json_serializer=serializer.encode,
                       json_deserializer=serializer.decode)
 
 engine = create_engine(DB_URL, **engine_options)
-session_factory = sessionmaker(bind=engine)
+replica_engines = [create_engine(url, **engine_options)
+                   for url in DB_REPLICA_URLS]
+session_factory = sessionmaker(class_=RoutingSession, bind=engine,
+                               replicas=replica_engines)
+
+metrics.register('db_pool', lambda: pool_stats(dict(
+    primary=engine,
+    **{'replica_{}'.format(index): replica
+       for index, replica in enumerate(replica_engines)})))
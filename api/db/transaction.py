@@ -0,0 +1,47 @@
+""" Per-request unit of work """
+from flask import current_app, g
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from api.error_handlers import handle_error
+
+from .commit import atomic
+
+_G_KEY = 'request_transaction'
+
+
+def begin_request_transaction():
+    """ Open the request's unit of work (before request) """
+    block = atomic()
+    block.begin()
+    setattr(g, _G_KEY, block)
+
+
+def end_request_transaction(response):
+    """ Commit the unit of work, or roll it back for error responses
+    (after request). A failing commit becomes the error response """
+    block = g.pop(_G_KEY, None)
+    if block is None:
+        return response
+
+    try:
+        block.end(failed=response.status_code >= 400)
+    except SQLAlchemyError as err:
+        return current_app.make_response(handle_error(err))
+
+    return response
+
+
+def abort_request_transaction(_exception=None):
+    """ Roll back a unit of work left open by an unhandled error
+    (teardown) """
+    block = g.pop(_G_KEY, None)
+    if block is not None:
+        block.end(failed=True)
+
+
+def init_request_transaction(app):
+    """ Bind one transaction to every request of `app` """
+    app.before_request(begin_request_transaction)
+    app.after_request(end_request_transaction)
+    app.teardown_request(abort_request_transaction)
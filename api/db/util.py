@@ -1,19 +1,107 @@
 """ Utils """
-
-from sqlalchemy import text, func
+import base64
+import binascii
+import datetime
+import enum
+import json
+from collections import OrderedDict
+from decimal import Decimal
+from uuid import UUID
+
+from sqlalchemy import (text, tuple_, literal, asc, desc, bindparam, inspect,
+                        and_, or_, nullsfirst, nullslast)
+from sqlalchemy.ext import baked
 from sqlalchemy.sql import ClauseElement
+from sqlalchemy.orm import load_only
 from sqlalchemy.orm.exc import NoResultFound
 
 from flask_sqlalchemy_session import current_session
 
 import config
+from api import metrics, strings
+from api.cache import TTLCache
+from api.error_handlers import is_query_canceled
 from api.errors import NotFoundError, APIError
 from api.logger import get_logger
 
-from .commit import commit
+from .bulk import get_covering_conflict_target, insert_or_get
+from .commit import commit, unwrap_session
+from .search import search
 
 logger = get_logger(__name__)  # pylint:disable=invalid-name
 
+COUNT_EXACT = 'exact'
+COUNT_WINDOW = 'window'
+COUNT_ESTIMATE = 'estimate'
+COUNT_CACHED = 'cached'
+COUNT_STRATEGIES = (COUNT_EXACT, COUNT_WINDOW, COUNT_ESTIMATE, COUNT_CACHED)
+
+_WINDOW_COUNT_COLUMN = '_total_count'
+
+count_cache = TTLCache(  # pylint:disable=invalid-name
+    config.COUNT_CACHE_SIZE, config.COUNT_CACHE_TTL_SECONDS)
+metrics.register('count_cache', count_cache.stats)
+
+
+class PageCount(int):
+    """ Total row count of a paginated query, `exact` is False if estimated
+    or served from cache """
+
+    def __new__(cls, value, exact=True):
+        count = super(PageCount, cls).__new__(cls, value)
+        count.exact = exact
+        return count
+
+
+# compiled statements of the fetch helpers, see `_cached_query`
+bakery = baked.bakery(size=config.DB_QUERY_CACHE_SIZE)  # pylint:disable=invalid-name
+
+
+def parse_sort(sort=None):
+    """
+    Splitting combined sort by string into field and direction
+    :param sort: String - `+field` (ASC) or `-field` (DESC)
+    :return: tuple - (String:field, Boolean:ascending)
+    """
+    order_by = sort if sort else '+created_at'
+    return order_by[1:], order_by[:1] == '+'
+
+
+def parse_fields(cls, fields=None):
+    """
+    Validating a sparse fieldset against `__serialize_attributes__`
+    :param cls: (Base) Model class
+    :param fields: String - `a,b` - or list of names; None means every field
+    :return: tuple of field names or None
+    :raises: APIError on unknown fields
+    """
+    if fields is None:
+        return None
+
+    if isinstance(fields, str):
+        fields = fields.split(',')
+
+    fields = tuple(OrderedDict.fromkeys(
+        field.strip() for field in fields if field.strip()))
+    invalid = [field for field in fields
+               if field not in cls.__serialize_attributes__]
+    if invalid:
+        raise APIError(strings.INVALID_FIELDS.format(', '.join(invalid)))
+
+    return fields or None
+
+
+def load_only_fields(cls, fields):
+    """
+    Loader option restricting the loaded columns to `fields` (the primary
+    key is always loaded)
+    :param cls: (Base) Model class
+    :param fields: field names
+    :return: loader option
+    """
+    columns = inspect(cls).column_attrs
+    return load_only(*[field for field in fields if field in columns])
+
 
 def get_sort_params(sort=None, cls=None):
     """
@@ -22,10 +110,8 @@ def get_sort_params(sort=None, cls=None):
     :param sort: String
     :return: Sting:(ordering + order_by)
     """
-    order_by = sort if sort else '+created_at'
-    ordering = order_by[:1]
-    order_by = order_by[1:]
-    ordering = ' ASC ' if ordering == '+' else ' DESC '
+    order_by, ascending = parse_sort(sort)
+    ordering = ' ASC ' if ascending else ' DESC '
 
     if (cls and order_by == 'created_at') or cls:
         order_by = "{}.{}".format(cls.__tablename__, order_by)
@@ -33,6 +119,141 @@ def get_sort_params(sort=None, cls=None):
     return order_by + ordering
 
 
+def _cursor_value(value):
+    """ JSON-safe, lossless version of a keyset value """
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+
+    if isinstance(value, enum.Enum):
+        return value.value
+
+    return value
+
+
+def encode_cursor(value, uuid):
+    """
+    Building an opaque pagination cursor from the last row of a page
+    :param value: sort column value of the last row
+    :param uuid: uuid of the last row (tie-breaker)
+    :return: String
+    """
+    payload = json.dumps([_cursor_value(value), _cursor_value(uuid)],
+                         separators=(',', ':'))
+    cursor = base64.urlsafe_b64encode(payload.encode('utf-8'))
+    return cursor.decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Reading the sort value and uuid back from a pagination cursor
+    :param cursor: String
+    :return: list - [value, uuid]
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = base64.urlsafe_b64decode(padded.encode('ascii'))
+        values = json.loads(payload.decode('utf-8'))
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise APIError(strings.INVALID_CURSOR)
+
+    if not isinstance(values, list) or len(values) != 2:
+        raise APIError(strings.INVALID_CURSOR)
+
+    try:
+        UUID(str(values[1]))
+    except ValueError:
+        raise APIError(strings.INVALID_CURSOR)
+
+    return values
+
+
+def _get_sort_column(cls, field):
+    """ Model attribute for a sort field, validated against the table """
+    if field not in cls.__table__.columns:
+        raise APIError(strings.INVALID_SORT_FIELD.format(field))
+    return getattr(cls, field)
+
+
+def _cursor_bind_value(column, value):
+    """ Converting a decoded cursor value back to the column's python type """
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+
+    if value is None:
+        return value
+
+    try:
+        if python_type in (datetime.datetime, datetime.date):
+            return python_type.fromisoformat(value)
+        if python_type is Decimal:
+            return Decimal(value)
+    except (ValueError, TypeError, ArithmeticError):
+        raise APIError(strings.INVALID_CURSOR)
+
+    return value
+
+
+def _filter_query(session, cls, keys, order_by, fields=None):
+    """ Query of not deleted `cls` rows with an equality bind per key """
+    criteria = [getattr(cls, key).is_(None) if is_null
+                else getattr(cls, key) == bindparam('p_' + key)
+                for key, is_null in keys]
+    query = session.query(cls).filter(cls.deleted_at.is_(None), *criteria)
+
+    if order_by is not None:
+        query = query.order_by(order_by)
+
+    if fields:
+        query = query.options(load_only_fields(cls, fields))
+
+    return query
+
+
+def _ids_query(session, cls, fields=None):
+    """ Query of not deleted `cls` rows in a list of uuids """
+    query = session.query(cls).filter(
+        cls.uuid.in_(bindparam('uuids', expanding=True)),
+        cls.deleted_at.is_(None))
+
+    if fields:
+        query = query.options(load_only_fields(cls, fields))
+
+    return query
+
+
+def _cached_query(cls, args, order_by=None, fields=None):
+    """
+    Baked (compiled once, then cached) query for `cls` filtered by `args`.
+    The statement is keyed by (model, filter keys, order_by, fields);
+    values are bound per call
+    :return: (BakedQuery, params) or None when the shape can't be cached
+    """
+    if not config.DB_QUERY_CACHE_ENABLED or \
+            not (order_by is None or isinstance(order_by, str)):
+        return None
+
+    keys, params = [], {}
+    for key, value in sorted(args.items()):
+        if key not in cls.__table__.columns or \
+                isinstance(value, ClauseElement):
+            return None
+
+        keys.append((key, value is None))
+        if value is not None:
+            params['p_' + key] = value
+
+    keys = tuple(keys)
+    fields = tuple(fields) if fields else None
+    return bakery(lambda session: _filter_query(session, cls, keys, order_by,
+                                                fields),
+                  cls, keys, order_by, fields), params
+
+
 def fetch(cls, uuid, session=None):
     """ Fetches an item from the database
 
@@ -47,8 +268,12 @@ def fetch(cls, uuid, session=None):
         (NotFoundError)
     """
     session = session if session else current_session
+    cached = _cached_query(cls, dict(uuid=uuid))
 
     try:
+        if cached:
+            query, params = cached
+            return query(unwrap_session(session)).params(**params).one()
         return session.query(cls).filter_by(uuid=uuid, deleted_at=None).one()
     except NoResultFound:
         raise NotFoundError('{} not found'.format(cls.__name__))
@@ -74,41 +299,107 @@ def fetch_by_filter(cls, args, session=None):
     :return: object of the specified class
     """
     session = session if session else current_session
+    cached = _cached_query(cls, args)
+
+    if cached:
+        query, params = cached
+        return query(unwrap_session(session)).params(**params).first()
+
     return session.query(cls).filter_by(**args, deleted_at=None).first()
 
 
-def get_query_by_filter(cls, args, session=None, order_by=None):
-    """ Get a query for a filter """
+def get_query_by_filter(cls, args, session=None, order_by=None, fields=None):
+    """ Get a query for a filter, loading only the columns of `fields` """
     session = session if session else current_session
     query = session.query(cls).filter_by(**args, deleted_at=None)
 
     if order_by:
         query = query.order_by(order_by)
 
+    if fields:
+        query = query.options(load_only_fields(cls, fields))
+
     return query
 
 
-def fetch_all_by_filter(cls, args, session=None, order_by=None):
+def fetch_all_by_filter(cls, args, session=None, order_by=None, fields=None):
     """
      Fetches all filtered items from the database
     :param cls: (Base) Model class
     :param args: dict of filters
+    :param fields: field names to load, every column by default
     :return: object list of the specified class
     """
-    query = get_query_by_filter(cls, args, session=session, order_by=order_by)
+    cached = _cached_query(cls, args, order_by=order_by or None,
+                           fields=fields)
+
+    if cached:
+        query, params = cached
+        session = session if session else current_session
+        return query(unwrap_session(session)).params(**params).all()
+
+    query = get_query_by_filter(cls, args, session=session, order_by=order_by,
+                                fields=fields)
     return query.all()
 
 
-def fetch_by_ids(cls, uuids, session=None):
+def fetch_chunks_by_filter(cls, args, session=None, order_by=None,
+                           chunk_size=config.STREAM_CHUNK_SIZE, fields=None):
+    """
+     Fetches filtered items `chunk_size` at a time (`yield_per`, a server
+     side cursor on PostgreSQL). Each chunk is expunged from the session
+     once the consumer moves on, so memory stays flat for any result size
+    :param cls: (Base) Model class
+    :param args: dict of filters
+    :param chunk_size: Integer - rows loaded per round trip
+    :param fields: field names to load, every column by default
+    :return: generator of object lists of the specified class
+    """
+    session = session if session else current_session
+    query = get_query_by_filter(cls, args, session=session, order_by=order_by,
+                                fields=fields).yield_per(chunk_size)
+
+    chunk = []
+    for obj in query:
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            yield chunk
+            _expunge(session, chunk)
+            chunk = []
+
+    if chunk:
+        yield chunk
+        _expunge(session, chunk)
+
+
+def _expunge(session, objects):
+    for obj in objects:
+        if obj in session:
+            session.expunge(obj)
+
+
+def fetch_by_ids(cls, uuids, session=None, fields=None):
     """
      Fetches all items from given id list
     :param cls: (Base) Model class
     :param uuids: list of ids
+    :param fields: field names to load, every column by default
     :return: object list of the specified class
     """
     session = session if session else current_session
-    return session.query(cls).filter(cls.uuid.in_(uuids),
-                                     cls.deleted_at.is_(None)).all()
+
+    if config.DB_QUERY_CACHE_ENABLED:
+        fields = tuple(fields) if fields else None
+        query = bakery(lambda session: _ids_query(session, cls, fields),
+                       cls, fields)
+        return query(unwrap_session(session)).params(uuids=list(uuids)).all()
+
+    query = session.query(cls).filter(cls.uuid.in_(uuids),
+                                      cls.deleted_at.is_(None))
+    if fields:
+        query = query.options(load_only_fields(cls, fields))
+
+    return query.all()
 
 
 def add_all(objects, session=None):
@@ -133,20 +424,69 @@ def save_all(objects, session=None):
     commit(session)
 
 
-def query_select(sql, session=None):
+def query_select(sql, session=None, stream=False,
+                 chunk_size=config.STREAM_CHUNK_SIZE):
     """
     Executing RAW SQL Query
     :param session: SQLAlchemy session
     :param sql: sql string
-    :return: list of rows [JSON]
+    :param stream: Boolean - yield rows lazily, see `stream_select`
+    :param chunk_size: Integer - rows fetched per round trip when streaming
+    :return: list of rows [JSON] (generator when streaming)
     """
+    if stream:
+        return stream_select(sql, chunk_size, session=session)
+
     result = query_execution(sql, session)
     result = [dict(row) for row in result]
     logger.debug("Executed Query - %s", sql)
     return result
 
 
-def pagination_select(sql, count_query, limit=config.DEFAULT_PAGINATION_LIMIT, page=0, sort=None):
+def stream_select(sql, chunk_size=config.STREAM_CHUNK_SIZE, session=None,
+                  params=None):
+    """
+    Executing RAW SQL Query through a server-side (named) cursor.
+    Rows are fetched `chunk_size` at a time and yielded lazily, so memory
+    stays constant regardless of the result size. The generator must be
+    consumed while the session is open, e.g. with `stream_with_context`
+    :param sql: sql string
+    :param chunk_size: Integer - rows fetched per round trip
+    :param session: SQLAlchemy session
+    :param params: dict of bind parameters
+    :return: generator of rows [JSON]
+    """
+    session = session if session else current_session
+
+    statement = text(sql)
+
+    try:
+        # the clause lets a routing session pick the bind (e.g. a replica)
+        connection = session.connection(clause=statement) \
+            .execution_options(stream_results=True)
+        result = connection.execute(statement, params or {})
+    except Exception as err:
+        logger.error("stream_select %s", str(err))
+        # kept as is for the error handler to answer 522
+        if is_query_canceled(err):
+            raise
+        raise APIError(str(err))
+
+    logger.debug("Executed Query - %s", sql)
+
+    try:
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        result.close()
+
+
+def pagination_select(sql, count_query, limit=config.DEFAULT_PAGINATION_LIMIT, page=0, sort=None,
+                      stream=False, count_strategy=None):
     """
     Executing RAW SQL Query
     :param sql: sql string
@@ -154,35 +494,180 @@ def pagination_select(sql, count_query, limit=config.DEFAULT_PAGINATION_LIMIT, p
     :param limit: Integer
     :param page: Integer
     :param sort: Query param
-    :return: list of rows [JSON]
+    :param stream: Boolean - yield rows lazily, see `stream_select`
+    :param count_strategy: COUNT_EXACT|COUNT_WINDOW|COUNT_ESTIMATE|
+                           COUNT_CACHED, defaults to `DEFAULT_COUNT_STRATEGY`
+    :return: list of rows [JSON] (generator when streaming), PageCount
     """
     page = int(page)
     limit = int(limit)
+    count_strategy = count_strategy or config.DEFAULT_COUNT_STRATEGY
+
+    if count_strategy not in COUNT_STRATEGIES:
+        raise ValueError('Unknown count strategy {}'.format(count_strategy))
+
+    base_sql = sql
+    order_by = 'ORDER BY {}'.format(get_sort_params(sort))
+    paging = ' LIMIT {} OFFSET {} '.format(limit, (page - 1) * limit) \
+        if page else ''
+
+    if count_strategy == COUNT_WINDOW and not stream:
+        # one round trip: the total is computed before LIMIT/OFFSET apply
+        sql = 'SELECT *, count(*) OVER () AS {} FROM ({}) AS counted_page {}' \
+            .format(_WINDOW_COUNT_COLUMN, base_sql, order_by) + paging
+        result = [dict(row) for row in query_execution(sql)]
+        logger.debug("Executed Query - %s", sql)
 
-    sql += 'ORDER BY {}'.format(get_sort_params(sort))
+        if result:
+            total = result[0][_WINDOW_COUNT_COLUMN]
+            for row in result:
+                del row[_WINDOW_COUNT_COLUMN]
+            return result, PageCount(total)
 
-    if page:
-        sql += ' LIMIT {} OFFSET {} '.format(limit, (page - 1) * limit)
+        # an empty page carries no total
+        return result, get_page_count(base_sql, count_query, COUNT_EXACT)
+
+    sql += order_by + paging
+
+    if stream:
+        return stream_select(sql), get_page_count(base_sql, count_query,
+                                                  count_strategy)
 
     result = query_execution(sql)
     result = [dict(row) for row in result]
     logger.debug("Executed Query - %s", sql)
-    return result, query_count(count_query)
+    return result, get_page_count(base_sql, count_query, count_strategy)
+
+
+def get_page_count(sql, count_query, count_strategy=COUNT_EXACT,
+                   session=None):
+    """
+    Total row count of a paginated query
+    - exact: runs `count_query`
+    - estimate: planner row estimate of `sql`, no scan
+    - cached: `count_query` result cached for `COUNT_CACHE_TTL_SECONDS`
+    - window: falls back to exact, the window count rides on the page query
+    :param sql: sql string - the unpaginated select
+    :param count_query: sql string
+    :param count_strategy: String
+    :return: PageCount
+    """
+    if count_strategy == COUNT_ESTIMATE:
+        return PageCount(estimate_count(sql, session), exact=False)
+
+    if count_strategy == COUNT_CACHED:
+        key = ' '.join(count_query.split())
+        total = count_cache.get(key)
+        if total is not None:
+            return PageCount(total, exact=False)
+
+        total = query_count(count_query, session)
+        count_cache.set(key, total)
+        return PageCount(total)
+
+    return PageCount(query_count(count_query, session))
+
+
+def estimate_count(sql, session=None):
+    """
+    Planner row estimate of a query (`EXPLAIN`), without executing it
+    :param sql: sql string
+    :return: Integer
+    """
+    result = query_execution('EXPLAIN (FORMAT JSON) {}'.format(sql), session)
+    plan = result.fetchone()[0]
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_table_count(table_name, session=None):
+    """
+    Row estimate of a whole table from `pg_class.reltuples`
+    :param table_name: String
+    :return: Integer
+    """
+    result = query_execution(
+        'SELECT reltuples::bigint FROM pg_class '
+        'WHERE oid = to_regclass(:table_name)',
+        session, dict(table_name=table_name))
+    one_row = result.fetchone()
+    return max(int(one_row[0]), 0) if one_row and one_row[0] else 0
+
+
+def _cursor_seek_sql(field, ascending, after_null):
+    """ Raw SQL condition of the rows after the cursor, NULLs sorting as the
+    highest values """
+    if after_null:
+        return ('({0} IS NULL AND uuid > :cursor_uuid)' if ascending else
+                '({0} IS NULL AND uuid < :cursor_uuid OR {0} IS NOT NULL)') \
+            .format(field)
+
+    return ('(({0}, uuid) > (:cursor_value, :cursor_uuid) OR {0} IS NULL)'
+            if ascending else '({0}, uuid) < (:cursor_value, :cursor_uuid)') \
+        .format(field)
+
+
+def cursor_pagination_select(sql, limit=config.DEFAULT_PAGINATION_LIMIT,
+                             sort=None, cursor=None, session=None):
+    """
+    Executing RAW SQL Query with keyset (cursor) pagination.
+    `sql` must select the sort column and `uuid`; pages are found with
+    `WHERE (sort_col, uuid) > (:value, :uuid)` instead of OFFSET, so every
+    page costs the same as the first one given an index on (sort_col, uuid).
+    NULL sort values come last (first when descending)
+    :param sql: sql string
+    :param limit: Integer
+    :param sort: Query param
+    :param cursor: `next_cursor` returned with the previous page
+    :param session: SQLAlchemy session
+    :return: list of rows [JSON], next_cursor
+    """
+    limit = int(limit)
+    field, ascending = parse_sort(sort)
+    if not field.isidentifier():
+        raise APIError(strings.INVALID_SORT_FIELD.format(field))
+
+    direction = 'ASC' if ascending else 'DESC'
+    params = dict(limit=limit + 1)
+    page_sql = 'SELECT * FROM ({}) AS keyset_page '.format(sql)
+
+    if cursor:
+        params['cursor_value'], params['cursor_uuid'] = decode_cursor(cursor)
+        page_sql += 'WHERE {} '.format(_cursor_seek_sql(
+            field, ascending, params['cursor_value'] is None))
 
+    page_sql += 'ORDER BY {0} {1} NULLS {2}, uuid {1} LIMIT :limit'.format(
+        field, direction, 'LAST' if ascending else 'FIRST')
 
-def query_execution(sql, session=None):
+    result = query_execution(page_sql, session, params)
+    result = [dict(row) for row in result]
+    logger.debug("Executed Query - %s", page_sql)
+
+    next_cursor = None
+    if len(result) > limit:
+        result = result[:limit]
+        next_cursor = encode_cursor(result[-1][field], result[-1]['uuid'])
+
+    return result, next_cursor
+
+
+def query_execution(sql, session=None, params=None):
     """
     Getting list from SQL query
     :param sql: sql string
+    :param params: dict of bind parameters
     :return: QuerySet list
     """
     session = session if session else current_session
 
     try:
-        result = session.execute(text(sql).execution_options(autocommit=True))
+        result = session.execute(text(sql).execution_options(autocommit=True),
+                                 params or {})
         return result
     except Exception as err:
         logger.error("query_execution %s", str(err))
+        # kept as is for the error handler to answer 522
+        if is_query_canceled(err):
+            raise
         raise APIError(str(err))
 
 
@@ -200,20 +685,31 @@ def query_count(sql, session=None):
 
 def get_or_create(cls, kwargs, session=None):
     """
-    Common function for get or creating model
+    Common function for get or creating model.
+    On PostgreSQL, when `kwargs` cover a unique constraint of the table, a
+    single `INSERT ... ON CONFLICT DO NOTHING` creates the row or finds the
+    one holding the same unique key
     :param cls: extended from BaseModel
     :param kwargs: dict - args
     :return: instance of given model
     """
     session = session if session else current_session
 
+    params = dict((k, v) for k, v in kwargs.items()
+                  if not isinstance(v, ClauseElement))
+    # NULLs never conflict, they can't be part of the conflict target
+    target = get_covering_conflict_target(
+        cls.__table__, [k for k, v in params.items() if v is not None]) \
+        if len(params) == len(kwargs) else None
+
+    if target and session.get_bind(mapper=inspect(cls)).dialect.name == \
+            'postgresql':
+        return insert_or_get(cls, params, target, session)
+
     instance = fetch_by_filter(cls, kwargs, session)
     if instance:
         return instance, False
 
-    params = dict((k, v) for k, v in kwargs.items()
-                  if not isinstance(v, ClauseElement))
-
     instance = cls(**params)
     instance.save(session)
 
@@ -241,17 +737,57 @@ def paginate_query_results(query, page=None, limit=None, sort=None, cls=None):
     return query.all()
 
 
-def search_by_filter(cls, field, value, order_by=None, limit=None):
-    """ Search by filter """
-    query = get_query_by_filter(cls, {}, order_by=order_by)
-
-    if value:
-        query = query.filter(
-            func.lower(field)
-                .contains(value.lower())
-        )
-
-    if limit:
-        query = query.limit(limit)
-
-    return query.all()
+def paginate_query_by_cursor(query, cls, limit, sort=None, cursor=None):
+    """
+    Keyset (cursor) paginate a query result.
+    Seeks past the last row of the previous page on (sort column, uuid)
+    instead of using OFFSET, so deep pages cost the same as the first one.
+    NULL sort values come after every other value (before them when
+    descending), a cursor from a NULL row continues among the NULLs
+    :param query: Query object
+    :param cls: Model class
+    :param limit: int
+    :param sort: str - `+field`/`-field`, same as `paginate_query_results`
+    :param cursor: str - `next_cursor` returned with the previous page
+    :return: list, next_cursor (None on the last page)
+    """
+    limit = int(limit)
+    field, ascending = parse_sort(sort)
+    column = _get_sort_column(cls, field)
+
+    if cursor:
+        value, uuid = decode_cursor(cursor)
+        uuid = literal(uuid, cls.uuid.type)
+        if value is None:
+            # the previous page ended among the NULLs
+            after = and_(column.is_(None),
+                         cls.uuid > uuid if ascending else cls.uuid < uuid)
+            query = query.filter(after if ascending
+                                 else or_(after, column.isnot(None)))
+        else:
+            bound = tuple_(literal(_cursor_bind_value(column, value),
+                                   column.type), uuid)
+            keyset = tuple_(column, cls.uuid)
+            query = query.filter(or_(keyset > bound, column.is_(None))
+                                 if ascending else keyset < bound)
+
+    # NULLs sort as the highest values, as in a PostgreSQL index
+    query = query.order_by(None).order_by(
+        nullslast(asc(column)) if ascending else nullsfirst(desc(column)),
+        asc(cls.uuid) if ascending else desc(cls.uuid))
+
+    result = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(result) > limit:
+        result = result[:limit]
+        next_cursor = encode_cursor(getattr(result[-1], field),
+                                    result[-1].uuid)
+
+    return result, next_cursor
+
+
+def search_by_filter(cls, field, value, order_by=None, limit=None, mode=None):
+    """ Search by filter, see `api.db.search.search` """
+    return search(cls, field, value, order_by=order_by, limit=limit,
+                  mode=mode)
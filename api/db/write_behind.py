@@ -0,0 +1,195 @@
+""" Write-behind queue for non-critical model updates """
+import atexit
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import bindparam
+from sqlalchemy.exc import SQLAlchemyError
+
+import config
+from api import metrics
+from api.logger import get_logger
+
+logger = get_logger(__name__)  # pylint:disable=invalid-name
+
+
+class WriteBehindQueue:
+    """
+    Bounded in-process queue of column updates, written in batches by a
+    background thread through its own session, opened with `factory` or
+    with the session factory of the app given to `init_app`.
+    Updates of the same row are coalesced (last value wins), so a hot row
+    costs one UPDATE per flush. Updates are lost if the process dies before
+    a flush: only use it for data that can be lost (audit timestamps, ...)
+    """
+
+    def __init__(self, factory=None, max_size=10000, batch_size=500,
+                 interval=1.0, enabled=True):
+        self.factory = factory
+        self.app = None
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.enabled = enabled
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.written = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        """
+        Writing through the sessions of the app: the factory behind
+        `app.db_session` is looked up on every flush, so the flusher follows
+        the app's databases
+        :param app: Flask app
+        """
+        self.app = app
+
+    def _session_factory(self):
+        if self.factory is not None:
+            return self.factory
+        return self.app.db_session.session_factory if self.app else None
+
+    def _start(self):
+        """ Flusher thread is started on first use, in the serving process """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run,
+                                            name='write-behind', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def enqueue(self, cls, uuid, **values):
+        """
+        Queueing an update of the `cls` row with `uuid`
+        :param cls: (Base) Model class
+        :param uuid: UUID|string
+        :param values: column values
+        :return: Boolean - False if the update was dropped (queue full)
+        """
+        key = (cls, str(uuid))
+
+        with self._lock:
+            if key in self._pending:
+                self._pending[key].update(values)
+                self.coalesced += 1
+                return True
+
+            if len(self._pending) >= self.max_size:
+                self.dropped += 1
+                return False
+
+            self._pending[key] = dict(values)
+            self.enqueued += 1
+            full_batch = len(self._pending) >= self.batch_size
+
+            if self.enabled:
+                self._start()
+
+        if not self.enabled:
+            self.flush()
+        elif full_batch:
+            self._wake.set()
+
+        return True
+
+    def flush(self):
+        """ Writing all queued updates, one executemany per statement shape """
+        factory = self._session_factory()
+        # updates queued before `init_app` wait for it
+        if factory is None:
+            return
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, OrderedDict()
+            if not pending:
+                return
+
+            groups = OrderedDict()
+            for (cls, uuid), values in pending.items():
+                groups.setdefault((cls, tuple(sorted(values))), []) \
+                    .append(dict({'v_' + key: value
+                                  for key, value in values.items()},
+                                 _uuid=uuid))
+
+            start = time.monotonic()
+            session = factory()
+            try:
+                for (cls, keys), rows in groups.items():
+                    session.execute(_update_statement(cls, keys), rows)
+                session.commit()
+                written = len(pending)
+            except SQLAlchemyError as err:
+                session.rollback()
+                written = 0
+                self.failed += len(pending)
+                logger.error('write-behind flush failed: %s', err)
+            finally:
+                session.close()
+
+            elapsed = time.monotonic() - start
+            self.flushes += 1
+            self.written += written
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def stop(self):
+        """ Stopping the flusher and writing what is left """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(self.interval + 5)
+        self.flush()
+
+    def stats(self):
+        """ Queue depth, drops and flush latency """
+        flushes = self.flushes or 1
+        return dict(enabled=self.enabled, max_size=self.max_size,
+                    queue_depth=len(self._pending), enqueued=self.enqueued,
+                    coalesced=self.coalesced, dropped=self.dropped,
+                    failed=self.failed, written=self.written,
+                    flushes=self.flushes,
+                    avg_flush_ms=round(self.total_seconds * 1000 / flushes, 2),
+                    max_flush_ms=round(self.max_seconds * 1000, 2))
+
+
+def _update_statement(cls, keys):
+    """ `UPDATE <table> SET <keys> WHERE uuid = :_uuid` for executemany """
+    table = cls.__table__
+    # bind names must differ from the column names of the SET clause
+    values = {key: bindparam('v_' + key, type_=table.c[key].type)
+              for key in keys}
+    # background bookkeeping is not a modification of the record
+    if 'updated_at' in table.c and 'updated_at' not in keys:
+        values['updated_at'] = table.c.updated_at
+
+    return table.update() \
+        .where(table.c.uuid == bindparam('_uuid')) \
+        .values(values)
+
+
+write_behind = WriteBehindQueue(  # pylint:disable=invalid-name
+    max_size=config.WRITE_BEHIND_QUEUE_SIZE,
+    batch_size=config.WRITE_BEHIND_BATCH_SIZE,
+    interval=config.WRITE_BEHIND_INTERVAL_SECONDS,
+    enabled=config.WRITE_BEHIND_ENABLED)
+
+metrics.register('write_behind', write_behind.stats)
+atexit.register(write_behind.stop)
@@ -1,30 +1,27 @@
 """ JSON encoder """
-import datetime
-import enum
-from decimal import Decimal
 from flask.json import JSONEncoder as FlaskJSONEncoder
 
+from api.serializer import fast_encode, to_json
+
 
 class JSONEncoder(FlaskJSONEncoder):
-    """ Custom JSON encoder """
+    """ Custom JSON encoder, encoding with the configured JSON backend """
 
     def default(self, obj):  # pylint: disable=method-hidden,arguments-differ
         """ Encode an object to JSON """
-
-        if isinstance(obj, datetime.datetime):
-            return obj.isoformat(timespec='milliseconds')
-
-        if isinstance(obj, datetime.date):
-            return obj.isoformat()
-
-        if isinstance(obj, Decimal):
-            return float(obj)
-
-        if isinstance(obj, enum.Enum):
-            return obj.value
-
-        from api.db.base import Base
-        if isinstance(obj, Base):
-            return obj.serialize()
-
-        return super(JSONEncoder, self).default(obj)
+        try:
+            return to_json(obj)
+        except TypeError:
+            return super(JSONEncoder, self).default(obj)
+
+    def encode(self, o):
+        """
+        Encode with the fast backend, unless pretty printing or escaping
+        non-ASCII characters (`JSON_AS_ASCII`), which it doesn't do
+        """
+        if self.indent is None and not self.ensure_ascii:
+            result = fast_encode(o, sort_keys=self.sort_keys)
+            if result is not None:
+                return result
+
+        return super(JSONEncoder, self).encode(o)
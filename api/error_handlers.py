@@ -1,6 +1,23 @@
 """ Error handlers """
 from flask import current_app as app, jsonify
-from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm.exc import NoResultFound, StaleDataError
+
+import config
+from api import strings
+
+# psycopg2 `QueryCanceled`, raised when `statement_timeout` is exceeded
+QUERY_CANCELED_PGCODE = '57014'
+
+
+def is_query_canceled(error):
+    """
+    Whether a database error is a statement canceled by `statement_timeout`
+    :param error: Exception
+    :return: bool
+    """
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) == \
+        QUERY_CANCELED_PGCODE
 
 
 def handle_error(error):
@@ -15,14 +32,32 @@ def handle_error(error):
     if not description:
         description = ",\n ".join([str(x) for x in error.args])
 
+    retry_after = getattr(error, 'retry_after', None)
+
     if isinstance(error, NoResultFound):
         status_code = 404
+    elif isinstance(error, StaleDataError):
+        # the row was updated since it was read
+        status_code = 412
+        description = strings.PRECONDITION_FAILED
+    elif isinstance(error, PoolTimeoutError):
+        # no connection available in time
+        status_code = 503
+        description = strings.SERVICE_BUSY
+        retry_after = config.DB_POOL_RETRY_AFTER_SECONDS
     elif isinstance(error, TimeoutError):
         status_code = 522
+    elif is_query_canceled(error):
+        status_code = 522
+        description = strings.QUERY_TIMEOUT
     elif hasattr(error, 'code'):
         status_code = error.code
     else:
         status_code = 400
 
+    headers = dict()
+    if retry_after:
+        headers['Retry-After'] = str(retry_after)
+
     return jsonify(error=description,
-                   error_type=error.__class__.__name__), status_code
+                   error_type=error.__class__.__name__), status_code, headers
@@ -44,6 +44,21 @@ class UnauthorizedError(APIError):
     code = 401
 
 
+class PreconditionFailedError(APIError):
+    """ Conditional request on a modified resource """
+    code = 412
+
+
 class UnsupportedMediaError(APIError):
     """ Unsupported file format """
     code = 415
+
+
+class ServiceUnavailableError(APIError):
+    """ Temporarily overloaded, the client should retry later """
+    code = 503
+
+    def __init__(self, description, *args, retry_after=None, **kwargs):
+        super(ServiceUnavailableError, self).__init__(description, *args,
+                                                      **kwargs)
+        self.retry_after = retry_after
@@ -4,9 +4,13 @@ from flask_cors import CORS
 from flask_sqlalchemy_session import flask_scoped_session
 
 from api.views import BLUEPRINTS
+from api.compression import init_compression
 from api.error_handlers import handle_error
 from api.encoder import JSONEncoder
 from api.db.session import session_factory
+from api.db.loader import clear_loader
+from api.db.write_behind import write_behind
+from api.db.transaction import init_request_transaction
 
 
 def create_app():
@@ -15,10 +19,17 @@ def create_app():
     app.config.from_object('config')
     app.json_encoder = JSONEncoder
     app.db_session = flask_scoped_session(session_factory, app)
+    write_behind.init_app(app)
 
     CORS(app)
 
     app.register_error_handler(Exception, handle_error)
+    app.teardown_request(clear_loader)
+    # after request hooks run in reverse: compression sees the final response
+    init_compression(app)
+
+    if app.config['DB_REQUEST_TRANSACTION']:
+        init_request_transaction(app)
     _ = list(map(app.register_blueprint, BLUEPRINTS))
 
     return app
@@ -0,0 +1,243 @@
+""" Password hashing executor """
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+import config
+from api import metrics, strings
+from api.errors import ServiceUnavailableError
+
+
+def _hashpw(password, rounds):
+    """ bcrypt hash of `password` (runs in a pool process) """
+    return bcrypt.hashpw(password.encode('utf-8'),
+                         bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(password, _hash):
+    """ bcrypt verification (runs in a pool process) """
+    return bcrypt.checkpw(password.encode('utf-8'), _hash.encode('utf-8'))
+
+
+def _run_chunk(func, args_list):
+    """ `func` applied to a chunk of args tuples (runs in a pool process) """
+    return [func(*args) for args in args_list]
+
+
+class HashingExecutor:
+    """
+    Process pool running bcrypt off the request threads.
+    At most `queue_size` calls wait for or run in the pool; further calls
+    are rejected with a 503 instead of piling up behind a login burst
+    """
+
+    def __init__(self, workers=None, queue_size=64, timeout=None,
+                 enabled=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.enabled = enabled
+        self.pending = 0
+        self.rejected = 0
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        """ Pool is created on first use, so every forked worker has its own """
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _record(self, start):
+        """ Hash latency metrics """
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self.calls += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def _acquire(self):
+        """ Taking one of the `queue_size` slots, 503 if none is free """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise self._busy()
+
+        with self._lock:
+            self.pending += 1
+
+    def _release(self, _future=None):
+        """ Freeing a slot, once its jobs are done (not when a caller gives
+        up waiting) """
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def _submit(self, jobs):
+        """
+        Submitting `jobs` to the pool under a single slot, released when
+        the last of them is done
+        :param jobs: list of (func, args) tuples
+        :return: list of futures
+        """
+        self._acquire()
+        futures = []
+        try:
+            pool = self._get_pool()
+            for func, args in jobs:
+                futures.append(pool.submit(func, *args))
+        except BrokenProcessPool:
+            # jobs of a broken pool fail without running
+            with self._lock:
+                self._pool = None
+            self._release()
+            raise
+
+        remaining = [len(futures)]
+
+        def done(_future):
+            with self._lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            self._release()
+
+        for future in futures:
+            future.add_done_callback(done)
+        return futures
+
+    def _busy(self):
+        """ 503 for a caller that can't be served now """
+        return ServiceUnavailableError(
+            strings.SERVICE_BUSY, retry_after=config.HASH_RETRY_AFTER_SECONDS)
+
+    def _result(self, future, timeout):
+        """ Result of a pool job, 503 once `timeout` is over; a broken pool
+        is recreated on next use """
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise self._busy()
+        except BrokenProcessPool:
+            with self._lock:
+                self._pool = None
+            raise
+
+    def run(self, func, *args):
+        """
+        Run `func` in the pool and wait for the result
+        :return: result of `func`
+        :raises: ServiceUnavailableError when the queue is full or after
+        `timeout` seconds
+        """
+        start = time.monotonic()
+
+        if not self.enabled:
+            try:
+                return func(*args)
+            finally:
+                self._record(start)
+
+        future = self._submit([(func, args)])[0]
+        try:
+            return self._result(future, self.timeout)
+        finally:
+            self._record(start)
+
+    def run_many(self, func, args_list):
+        """
+        Run `func` once per args tuple, spread over every pool process.
+        The whole batch takes a single queue slot, and may take `timeout`
+        seconds per call and process
+        :param args_list: list of args tuples
+        :return: list of results, in order
+        :raises: ServiceUnavailableError when the queue is full or the
+        batch takes too long
+        """
+        start = time.monotonic()
+
+        if not self.enabled or not args_list:
+            try:
+                return [func(*args) for args in args_list]
+            finally:
+                self._record(start)
+
+        chunk_size = max(1, len(args_list) // (self.workers * 4))
+        chunks = [args_list[index:index + chunk_size]
+                  for index in range(0, len(args_list), chunk_size)]
+        futures = self._submit([(_run_chunk, (func, chunk))
+                                for chunk in chunks])
+
+        deadline = None
+        if self.timeout:
+            deadline = start + self.timeout * \
+                -(-len(args_list) // self.workers)
+
+        try:
+            results = []
+            for future in futures:
+                timeout = None if deadline is None \
+                    else max(deadline - time.monotonic(), 0)
+                results.extend(self._result(future, timeout))
+            return results
+        except BaseException:
+            # jobs that haven't started yet are dropped
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            self._record(start)
+
+    def stats(self):
+        """ Queue depth and hash latency """
+        calls = self.calls or 1
+        return dict(enabled=self.enabled, workers=self.workers,
+                    queue_size=self.queue_size, queue_depth=self.pending,
+                    rejected=self.rejected, calls=self.calls,
+                    avg_ms=round(self.total_seconds * 1000 / calls, 2),
+                    max_ms=round(self.max_seconds * 1000, 2))
+
+
+hashing_executor = HashingExecutor(  # pylint:disable=invalid-name
+    workers=config.HASH_POOL_WORKERS, queue_size=config.HASH_QUEUE_SIZE,
+    timeout=config.HASH_TIMEOUT_SECONDS, enabled=config.HASH_POOL_ENABLED)
+
+metrics.register('password_hashing', hashing_executor.stats)
+
+
+def hash_password(password):
+    """
+    Getting bcrypt hash of password with `BCRYPT_ROUNDS` cost
+    :param password: string password
+    :return: string hash
+    """
+    return hashing_executor.run(_hashpw, password, config.BCRYPT_ROUNDS)
+
+
+def verify_password(password, _hash):
+    """
+    Matching hash and password
+    :param password: string
+    :param _hash: string
+    :return: Boolean
+    """
+    return hashing_executor.run(_checkpw, password, _hash)
+
+
+def hash_many(passwords):
+    """
+    Getting bcrypt hashes of many passwords, in parallel
+    :param passwords: list of string passwords
+    :return: list of string hashes, in order
+    """
+    return hashing_executor.run_many(
+        _hashpw, [(password, config.BCRYPT_ROUNDS) for password in passwords])
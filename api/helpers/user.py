@@ -13,7 +13,20 @@ from api.models import User, UserStatusEnum, UserRoleEnum
 LOGGER = get_logger(__name__)  # pylint:disable=invalid-name
 
 
+# unique indexes of `users` -> conflict message
+_CONSTRAINT_MESSAGES = {
+    'uix_phone_no_role': strings.USER_PHONE_NUMBER_EXISTS,
+    'uix_email_role': strings.EMAIL_EXISTS,
+}
+
+
 def _get_user_creation_error_message(error):
+    # psycopg2 reports the violated constraint in the error diagnostics
+    diag = getattr(getattr(error, 'orig', None), 'diag', None)
+    constraint_name = getattr(diag, 'constraint_name', None)
+    if constraint_name in _CONSTRAINT_MESSAGES:
+        return _CONSTRAINT_MESSAGES[constraint_name]
+
     error = str(error)
 
     if error.__contains__('unique_phone_no'):
@@ -62,18 +75,19 @@ def create_user(payload, role, password):
     return user
 
 
-def generate_jwt(user_uuid):
+def generate_jwt(user_uuid, claims=None):
     """
     Generating JWT access token and refresh token
     :param user_uuid: string
+    :param claims: dict - signed authorization claims
     :return: dict of access token and refresh token
     """
     user_uuid = str(user_uuid)
 
     access_token = get_jwt(user_uuid,
-                           config.JWT_ACCESS_TOKEN_TIMEOUT_MINUTES)
+                           config.JWT_ACCESS_TOKEN_TIMEOUT_MINUTES, claims)
     refresh_token = get_jwt(user_uuid,
-                            config.JWT_REFRESH_TOKEN_TIMEOUT_MINUTES)
+                            config.JWT_REFRESH_TOKEN_TIMEOUT_MINUTES, claims)
 
     return dict(access_token=access_token,
                 refresh_token=refresh_token)
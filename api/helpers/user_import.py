@@ -0,0 +1,211 @@
+""" Bulk user import (PostgreSQL `COPY`) """
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+from uuid import uuid4
+
+from flask_sqlalchemy_session import current_session
+from validate_email import validate_email as is_valid_email
+from werkzeug.exceptions import BadRequest
+
+import config
+from api import strings
+from api.db.commit import atomic
+from api.errors import UnsupportedMediaError
+from api.hashing import hash_many
+from api.logger import get_logger
+from api.streaming import NDJSON_MIMETYPE
+from api.models import User, UserStatusEnum, UserRoleEnum
+from api.util import validate_fields
+from api.validators.users import (SIGNUP_REQUIRED_FIELDS,
+                                  validate_password_terms)
+
+LOGGER = get_logger(__name__)  # pylint:disable=invalid-name
+
+FORMAT_CSV = 'csv'
+FORMAT_NDJSON = 'ndjson'
+FORMATS = (FORMAT_CSV, FORMAT_NDJSON)
+FORMAT_MIMETYPES = {'text/csv': FORMAT_CSV, NDJSON_MIMETYPE: FORMAT_NDJSON}
+
+_STAGING_TABLE = 'users_import'
+# columns written by the import, in COPY order
+_COLUMNS = ('uuid', 'email', 'phone_no', 'first_name', 'last_name', 'age',
+            'img_url', 'role', 'status', 'password_hash', 'created_at',
+            'updated_at')
+
+
+class ImportResult:
+    """ Outcome of `import_users`, rows numbered from 1 """
+
+    def __init__(self):
+        self.total = 0
+        self.inserted = 0
+        self.invalid = []
+        self.conflicted = []
+
+    def as_dict(self):
+        """ JSON-serializable outcome """
+        return dict(total=self.total, inserted=self.inserted,
+                    invalid=self.invalid, conflicted=self.conflicted)
+
+
+def _lines(stream):
+    """ Decoded lines of a binary stream (a leading BOM is dropped) """
+    for line in stream:
+        yield line.decode('utf-8-sig')
+
+
+def iter_rows(stream, fmt):
+    """
+    Parsing a CSV (with a header row) or NDJSON stream lazily
+    :param stream: binary file-like object
+    :param fmt: FORMAT_CSV|FORMAT_NDJSON
+    :return: generator of (row number, dict|None if unparsable)
+    """
+    if fmt == FORMAT_CSV:
+        for number, row in enumerate(csv.DictReader(_lines(stream)), 1):
+            yield number, row
+        return
+
+    for number, line in enumerate(_lines(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def validate_row(row):
+    """
+    Signup validation of an imported row
+    :param row: dict
+    :return: dict of allowed attributes (with `password`)
+    :raises: BadRequest
+    """
+    if row is None:
+        raise BadRequest(strings.INVALID_PAYLOAD)
+
+    row = {key: None if row.get(key) in ('', None) else row[key]
+           for key in User.__payload_allowed_attributes__}
+    validate_fields(row, SIGNUP_REQUIRED_FIELDS)
+
+    row['email'] = str(row['email']).lower().strip()
+    if not is_valid_email(row['email']):
+        raise BadRequest(strings.INVALID_EMAIL)
+
+    row['password'] = str(row['password'])
+    validate_password_terms(row['password'])
+
+    if row['age'] is not None:
+        try:
+            row['age'] = int(row['age'])
+        except ValueError:
+            raise BadRequest(strings.INVALID_AGE)
+
+    # over-long values would fail the whole COPY
+    for key, value in row.items():
+        length = getattr(User.__table__.c[key].type, 'length', None) \
+            if key in User.__table__.c else None
+        if length and value is not None and len(str(value)) > length:
+            raise BadRequest(strings.FIELD_TOO_LONG.format(key))
+
+    return row
+
+
+def _copy_batch(cursor, batch, role):
+    """ Hashing a batch of valid rows and COPYing it into staging """
+    hashes = hash_many([row.pop('password') for _, row in batch])
+    now = datetime.utcnow()
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for (number, row), password_hash in zip(batch, hashes):
+        row.update(uuid=uuid4(), role=role.value,
+                   status=UserStatusEnum.ACTIVE.value,
+                   password_hash=password_hash, created_at=now,
+                   updated_at=now)
+        # None is written as an unquoted empty field, i.e. NULL
+        writer.writerow([number] + [row[column] for column in _COLUMNS])
+
+    buffer.seek(0)
+    cursor.copy_expert('COPY {} (row_no, {}) FROM STDIN WITH (FORMAT csv)'
+                       .format(_STAGING_TABLE, ', '.join(_COLUMNS)), buffer)
+
+
+def _merge(connection):
+    """
+    Inserting the staged rows, skipping those conflicting with a user (or
+    with an earlier row)
+    :return: list of conflicting row numbers
+    """
+    columns = ', '.join(_COLUMNS)
+    result = connection.execute('''
+        WITH inserted AS (
+            INSERT INTO users ({columns})
+            SELECT {columns} FROM {staging} ORDER BY row_no
+            ON CONFLICT DO NOTHING
+            RETURNING uuid)
+        SELECT row_no FROM {staging}
+        WHERE uuid NOT IN (SELECT uuid FROM inserted)
+        ORDER BY row_no
+    '''.format(columns=columns, staging=_STAGING_TABLE))
+
+    return [row.row_no for row in result]
+
+
+def import_users(stream, fmt, role=UserRoleEnum.PARENT,
+                 batch_size=config.IMPORT_BATCH_SIZE, session=None):
+    """
+    Importing users from a CSV/NDJSON stream in one transaction:
+    rows are validated like signups while streaming, hashed in the password
+    pool `batch_size` at a time and COPYed into a temporary staging table,
+    which is then merged into `users` with a single INSERT ... ON CONFLICT.
+    Invalid and conflicting rows are skipped and reported
+    :param stream: binary file-like object
+    :param fmt: FORMAT_CSV|FORMAT_NDJSON
+    :param role: UserRoleEnum of the imported users
+    :param batch_size: Integer - rows hashed and copied at a time
+    :return: ImportResult
+    """
+    if fmt not in FORMATS:
+        raise UnsupportedMediaError(strings.INVALID_IMPORT_FORMAT)
+
+    session = session if session else current_session
+    result = ImportResult()
+    rows = iter_rows(stream, fmt)
+
+    with atomic(session):
+        connection = session.connection()
+        connection.execute(
+            'CREATE TEMP TABLE {} (LIKE users INCLUDING DEFAULTS, '
+            'row_no INTEGER) ON COMMIT DROP'.format(_STAGING_TABLE))
+        cursor = connection.connection.cursor()
+
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+
+            batch = []
+            for number, row in chunk:
+                result.total += 1
+                try:
+                    batch.append((number, validate_row(row)))
+                except BadRequest as err:
+                    result.invalid.append(dict(row=number,
+                                               error=err.description))
+            if batch:
+                _copy_batch(cursor, batch, role)
+
+        conflicted = _merge(connection)
+
+    result.conflicted = [dict(row=number, error=strings.USER_EXISTS)
+                         for number in conflicted]
+    result.inserted = result.total - len(result.invalid) - len(conflicted)
+    LOGGER.info('imported %s of %s users', result.inserted, result.total)
+
+    return result
@@ -0,0 +1,21 @@
+""" In-process metrics registry """
+from collections import OrderedDict
+
+_SOURCES = OrderedDict()
+
+
+def register(name, source):
+    """
+    Registering a metrics source
+    :param name: String - key of the source in the snapshot
+    :param source: callable returning a JSON-serializable dict
+    """
+    _SOURCES[name] = source
+
+
+def snapshot():
+    """
+    Collecting the current value of every registered source
+    :return: dict
+    """
+    return {name: source() for name, source in _SOURCES.items()}
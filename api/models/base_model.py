@@ -2,12 +2,14 @@
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime
+from sqlalchemy import Column, DateTime, Index, Integer, event
+from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy_utils import UUIDType
 
 from flask_sqlalchemy_session import current_session
 
 from api.db.base import Base
+from api.db.search import add_search_indexes
 
 
 class BaseModel(Base):
@@ -19,8 +21,50 @@ class BaseModel(Base):
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow,
                         onupdate=datetime.utcnow)
+    # bumped by every ORM update; an update of a stale row raises
+    # `StaleDataError`
+    version_id = Column(Integer, nullable=False, default=1, server_default='1')
+
+    @declared_attr
+    def __mapper_args__(cls):  # pylint:disable=no-self-argument
+        return {'version_id_col': cls.__table__.c.version_id}
 
     @classmethod
     def query(cls):
         """ alias for `query_property()` """
         return current_session.query(cls)
+
+
+def add_partial_indexes(table):
+    """
+    Restricting the non-unique indexes of a table to live rows
+    (`WHERE deleted_at IS NULL`): every fetch filters soft deleted rows out,
+    so they only bloat the indexes. Unique indexes are left as declared
+    :param table: Table
+    """
+    where = table.c.deleted_at.is_(None)
+    for index in table.indexes:
+        if index.unique or 'deleted_at' in index.columns or \
+                index.dialect_options['postgresql']['where'] is not None:
+            continue
+        index.dialect_options['postgresql']['where'] = where
+        index.dialect_options['sqlite']['where'] = where
+
+
+def add_deleted_index(table):
+    """
+    Index of the soft deleted rows (`WHERE deleted_at IS NOT NULL`), read
+    in `deleted_at` order by the archival job, see `api.db.archive`
+    :param table: Table
+    """
+    where = table.c.deleted_at.isnot(None)
+    Index('ix_{}_deleted_at'.format(table.name), table.c.deleted_at,
+          postgresql_where=where, sqlite_where=where)
+
+
+@event.listens_for(BaseModel, 'instrument_class', propagate=True)
+def _declare_indexes(mapper, cls):
+    """ Indexes derived from model metadata """
+    add_search_indexes(mapper.local_table, cls.__searchable_attributes__)
+    add_partial_indexes(mapper.local_table)
+    add_deleted_index(mapper.local_table)
@@ -1,13 +1,21 @@
 """ `User` model """
 import enum
+from datetime import datetime
+from functools import partial
 
 from sqlalchemy_utils import UUIDType
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy import (Column, String, Integer, ForeignKey, Float,
-                        UniqueConstraint,
-                        func)
+from sqlalchemy import (Column, String, Integer, ForeignKey, Float, DateTime,
+                        Index,
+                        event, func, inspect, text)
+from sqlalchemy.orm import object_session
 from flask_sqlalchemy_session import current_session
-import bcrypt
+
+from api.cache import principal_cache
+from api.db.commit import on_commit
+from api.db.search import SEARCH_SUBSTRING
+from api.hashing import hash_password, verify_password
+from api.revocation import revoke_tokens
 
 from .base_model import BaseModel
 
@@ -46,8 +54,26 @@ class User(BaseModel):
         'email', 'password', 'phone_no', 'first_name', 'last_name', 'age',
         'img_url')
 
-    __table_args__ = (UniqueConstraint('email', 'role',
-                                       name='uix_email_role'),)
+    # role/status claims of tokens, see `_revoke_on_access_change`
+    __access_attributes__ = ('role', 'status', 'deleted_at')
+
+    __searchable_attributes__ = {
+        'email': SEARCH_SUBSTRING, 'phone_no': SEARCH_SUBSTRING,
+        'first_name': SEARCH_SUBSTRING, 'last_name': SEARCH_SUBSTRING}
+
+    # unique among live rows only: a soft deleted user doesn't block a new
+    # signup with the same email or phone number
+    __table_args__ = (Index('uix_email_role', 'email', 'role', unique=True,
+                            postgresql_where=text('deleted_at IS NULL'),
+                            sqlite_where=text('deleted_at IS NULL')),
+                      Index('uix_phone_no_role', 'phone_no', 'role',
+                            unique=True,
+                            postgresql_where=text('deleted_at IS NULL'),
+                            sqlite_where=text('deleted_at IS NULL')),
+                      # polled by every process, see `api.revocation`
+                      Index('ix_users_access_changed_at', 'access_changed_at',
+                            postgresql_where=text(
+                                'access_changed_at IS NOT NULL')))
 
     email = Column(String(256), index=True, nullable=True)
     phone_no = Column(String(12), nullable=False, index=True)
@@ -58,6 +84,12 @@ class User(BaseModel):
     img_url = Column(String, nullable=True)
     role = Column(String(20), nullable=False)
     status = Column(String(20), nullable=True)
+    # written through the write-behind queue, may lag a second behind
+    last_login_at = Column(DateTime(timezone=True), nullable=True)
+    last_seen_at = Column(DateTime(timezone=True), nullable=True)
+    # last change of role, status or deleted_at: tokens issued before it are
+    # revoked
+    access_changed_at = Column(DateTime(timezone=True), nullable=True)
 
     @hybrid_property
     def name(self):
@@ -72,6 +104,25 @@ class User(BaseModel):
         """
         return self.find_currency()
 
+    def after_commit(self):
+        """ Drop the cached auth principal of the user """
+        # identity key avoids refreshing the expired object
+        identity = inspect(self).identity
+        if identity:
+            principal_cache.invalidate(str(identity[0]))
+
+    @classmethod
+    def after_bulk_delete(cls, uuids):
+        """ Bulk updates skip the ORM events, revoke tokens here """
+        cls.after_bulk_access_change(uuids)
+
+    @classmethod
+    def after_bulk_access_change(cls, uuids):
+        """ Bulk updates skip the ORM events, revoke tokens here """
+        for uuid in uuids:
+            principal_cache.invalidate(str(uuid))
+            revoke_tokens(uuid)
+
     @staticmethod
     def generate_hash(password):
         """
@@ -79,8 +130,7 @@ class User(BaseModel):
         :param password: string password
         :return: string hash
         """
-        return bcrypt.hashpw(password.encode('utf-8'),
-                             bcrypt.gensalt()).decode('utf-8')
+        return hash_password(password)
 
     @staticmethod
     def verify_hash(password, _hash):
@@ -90,12 +140,12 @@ class User(BaseModel):
         :param _hash: string
         :return: Boolean
         """
-        return bcrypt.checkpw(password.encode('utf-8'), _hash.encode('utf-8'))
+        return verify_password(password, _hash)
 
     @classmethod
     def find_by_email(cls, email, role=UserRoleEnum.PARENT, session=None):
         """
-        Get parent object by email
+        Get the live (not soft deleted) user by email
         :param role: UserRoleEnum
         :param email: string
         :return: User object
@@ -103,4 +153,25 @@ class User(BaseModel):
         session = session if session else current_session
         return session.query(cls) \
             .filter(func.lower(User.email) == func.lower(email),
-                    User.role == role.value).first()
+                    User.role == role.value,
+                    User.deleted_at.is_(None)).first()
+
+
+@event.listens_for(User, 'before_update')
+def _revoke_on_access_change(_mapper, _connection, target):
+    """ Tokens carrying role/status claims go stale with these columns.
+    The change is recorded in the same UPDATE, so every process sees it
+    once committed, and tokens are revoked here at COMMIT """
+    attrs = inspect(target).attrs
+    if any(attrs[key].history.has_changes()
+           for key in User.__access_attributes__):
+        target.access_changed_at = datetime.utcnow()
+        on_commit(partial(revoke_tokens, target.uuid), object_session(target))
+
+
+@event.listens_for(User, 'after_delete')
+def _revoke_on_delete(_mapper, _connection, target):
+    """ Tokens of a removed user are no longer valid. Other processes can't
+    poll a removed row: they only see soft deletes, the way the API deletes
+    users """
+    on_commit(partial(revoke_tokens, target.uuid), object_session(target))
@@ -1,99 +1,185 @@
 """ REST Operations """
-from datetime import datetime
+from functools import partial
 
-from flask import jsonify
-from flask_sqlalchemy_session import current_session as session
+from flask import has_request_context, jsonify, request
 
 from sqlalchemy.exc import IntegrityError
 from werkzeug.exceptions import BadRequest
 
+import config
 from api import strings
-from api.db.util import fetch, fetch_all, fetch_all_by_filter, save_all
-from api.util import no_content_response
+from api.db.bulk import (bulk_upsert, bulk_soft_delete, parse_uuids,
+                         CONFLICT_FAIL)
+from api.db.commit import atomic, on_commit
+from api.db.loader import load
+from api.db.serializers import get_serializer, serialize_many
+from api.db.util import (fetch_all_by_filter, fetch_chunks_by_filter,
+                         get_query_by_filter, load_only_fields,
+                         paginate_query_by_cursor, parse_fields,
+                         parse_sort)
+from api.streaming import stream_response
+from api.util import (no_content_response, get_etag, etag_headers,
+                      not_modified_response, validate_if_match)
 from api.logger import get_logger
 
 logger = get_logger(__name__)  # pylint:disable=invalid-name
 
 
-def _serialize(json_key, obj, status_code=200):
-    return jsonify(**{json_key: obj}), status_code
+def _serialize(json_key, obj, status_code=200, headers=None):
+    return jsonify(**{json_key: obj}), status_code, headers or {}
+
+
+def get_fields(cls, fields=None):
+    """
+    Sparse fieldset of the response: `fields`, else the request's
+    `?fields=a,b`, validated against `__serialize_attributes__`
+    :return: tuple of field names or None for every field
+    """
+    if fields is None and has_request_context():
+        fields = request.args.get('fields')
+    return parse_fields(cls, fields)
+
+
+def _serialize_obj(obj, fields):
+    return obj if fields is None else get_serializer(type(obj), fields)(obj)
 
 
 def create(cls, payload, json_key):
     """ Create a new resource """
     obj = cls(**payload)
     obj.save()
-    return _serialize(json_key, obj, 201)
+    return _serialize(json_key, obj, 201, etag_headers(get_etag(obj)))
 
 
-def create_multiple(cls, payload, json_key=None, validation_func=None):
-    """ Create multiple instances of `cls` """
+def create_multiple(cls, payload, json_key=None, validation_func=None,
+                    on_conflict=CONFLICT_FAIL):
+    """ Create multiple instances of `cls` with a bulk upsert """
     json_key = json_key if json_key else 'result'
 
-    objs = []
     if validation_func:
         for item in payload:
             validation_func(**item)
-            objs.append(cls(**item))
-    else:
-        objs = [cls(**item) for item in payload]
 
     try:
-        save_all(objs)
+        result = bulk_upsert(cls, payload, on_conflict=on_conflict)
     except IntegrityError as err:
         logger.error('Error: %s', err)
         return jsonify(**{json_key: False, 'error': 'Integrity Error'})
 
-    return jsonify(**{json_key: True}), 201
+    if result.conflicted:
+        logger.error('Error: conflicting rows %s', result.conflicted)
+        return jsonify(**{json_key: False, 'error': 'Integrity Error',
+                          **result.as_dict()})
 
+    return jsonify(**{json_key: True, **result.as_dict()}), 201
 
-def update(cls, uuid, payload, json_key, obj=None):
-    """ Update a resource """
+
+def update(cls, uuid, payload, json_key, obj=None, fields=None):
+    """ Update a resource, if it matches the request's `If-Match`.
+    The whole row is loaded: `fields` (`?fields=`) only shapes the response,
+    as the update and its listeners may read any column """
+    fields = get_fields(cls, fields)
     if not obj:
-        obj = fetch(cls, uuid)
+        obj = load(cls, uuid)
 
+    validate_if_match(get_etag(obj))
     obj.update(payload)
     obj.save()
 
-    return _serialize(json_key, obj)
+    return _serialize(json_key, _serialize_obj(obj, fields),
+                      headers=etag_headers(get_etag(obj)))
+
 
+def get(cls, uuid, json_key, obj=None, fields=None):
+    """ Fetch a resource, `304` if the request's `If-None-Match` has it,
+    only the columns of `fields` (`?fields=`) and the etag loaded """
+    fields = get_fields(cls, fields)
+    if not obj:
+        obj = load(cls, uuid, fields=fields + ('version_id',)
+                   if fields else None)
 
-def get(cls, uuid, json_key):
-    """ Fetch a resource """
-    return _serialize(json_key, fetch(cls, uuid))
+    etag = get_etag(obj)
+    return not_modified_response(etag) or \
+        _serialize(json_key, _serialize_obj(obj, fields),
+                   headers=etag_headers(etag))
 
 
 def delete(cls, uuid, obj=None):
     """ Delete a resource """
     if not obj:
-        obj = fetch(cls, uuid)
+        obj = load(cls, uuid)
 
     obj.delete()
     return no_content_response()
 
 
 def delete_bulk(cls, uuids):
-    """ Delete multiple resources """
+    """ Delete multiple resources, all or nothing """
+    requested, invalid = parse_uuids(uuids)
+
+    with atomic():
+        deleted = bulk_soft_delete(cls, requested) if requested else set()
+        # unparsable ids, then ids of missing or already deleted rows
+        invalid += [value for uuid, value in requested.items()
+                    if uuid not in deleted]
+        if invalid:
+            raise BadRequest(strings.INVALID_UUIDS.format(
+                cls.__tablename__, ', '.join(map(str, invalid))))
+        on_commit(partial(cls.after_bulk_delete, deleted))
 
-    query = session.query(cls) \
-        .filter(cls.uuid.in_(uuids), cls.deleted_at.is_(None))
+    return no_content_response()
 
-    if query.count() != len(uuids):
-        raise BadRequest(strings.INVALID_UUID_LIST.format(cls.__tablename__))
 
-    query.update({cls.deleted_at: datetime.utcnow()},
-                 synchronize_session=False)
-    session.commit()
+def _stream_list(chunks, json_key, fields=None):
+    """ JSON array (or NDJSON) response serializing one chunk at a time """
+    def rows():
+        for chunk in chunks:
+            for row in serialize_many(chunk, fields):
+                yield row
+
+    return stream_response(rows(), json_key)
+
+
+def get_list(cls, json_key, order_by=None, stream=None, fields=None):
+    """ get a list of objects, streamed if `stream` (`STREAM_LISTS`) """
+    return get_list_by_filter(cls, dict(), json_key, order_by=order_by,
+                              stream=stream, fields=fields)
+
+
+def get_list_by_filter(cls, filter_params, json_key, order_by=None,
+                       stream=None, fields=None):
+    """ get a list of objects by filter, streamed if `stream`
+    (`STREAM_LISTS`), only the columns of `fields` (`?fields=`) loaded """
+    fields = get_fields(cls, fields)
+    stream = config.STREAM_LISTS if stream is None else stream
+    if stream:
+        return _stream_list(fetch_chunks_by_filter(cls, filter_params,
+                                                   order_by=order_by,
+                                                   fields=fields),
+                            json_key, fields)
+
+    return _serialize(json_key, serialize_many(
+        fetch_all_by_filter(cls, filter_params, order_by=order_by,
+                            fields=fields), fields))
 
-    return no_content_response()
 
+def get_page(cls, json_key, limit, sort=None, cursor=None, filter_params=None,
+             fields=None):
+    """ get a cursor paginated list of objects """
+    fields = get_fields(cls, fields)
+    query = get_query_by_filter(cls, filter_params or dict())
+    if fields:
+        # the cursor is built from the sort column of the last row
+        sort_field, _ = parse_sort(sort)
+        query = query.options(load_only_fields(cls, fields + (sort_field,)))
 
-def get_list(cls, json_key, order_by=None):
-    """ get a list of objects """
-    return _serialize(json_key, fetch_all(cls, order_by=order_by))
+    objs, next_cursor = paginate_query_by_cursor(query, cls, limit,
+                                                 sort=sort, cursor=cursor)
+    return jsonify(**{json_key: serialize_many(objs, fields),
+                      'next_cursor': next_cursor}), 200
 
 
-def get_list_by_filter(cls, filter_params, json_key, order_by=None):
-    """ get a list of objects by filter"""
-    return _serialize(json_key, fetch_all_by_filter(cls, filter_params,
-                                                    order_by=order_by))
+def get_paginated(json_key, rows, count):
+    """ paginated list response with the total and whether it is exact """
+    return jsonify(**{json_key: rows, 'total': int(count),
+                      'total_is_exact': getattr(count, 'exact', True)}), 200
@@ -0,0 +1,166 @@
+""" Per-user minimum token versions for revoking stateless tokens """
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import DateTime, column, table
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy_utils import UUIDType
+
+import config
+from api import metrics
+from api.db.commit import unwrap_session
+from api.logger import get_logger
+
+logger = get_logger(__name__)  # pylint:disable=invalid-name
+
+# changes committed this long after their `access_changed_at` are still seen
+POLL_OVERLAP_SECONDS = 60
+
+_USERS = table('users', column('uuid', UUIDType(binary=False)),
+               column('access_changed_at', DateTime(timezone=True)))
+
+
+def token_version():
+    """
+    Version of a token issued now
+    :return: Integer - milliseconds since epoch
+    """
+    return int(time.time() * 1000)
+
+
+def get_version(timestamp):
+    """
+    Token version of a timestamp
+    :param timestamp: datetime - naive UTC or timezone aware
+    :return: Integer - milliseconds since epoch
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return int(timestamp.timestamp() * 1000)
+
+
+class RevocationTable:
+    """
+    Per-user minimum token versions: tokens of a user issued before the
+    minimum are rejected.
+    Every process keeps its own table. Access changes committed by the
+    process apply at once (`revoke`); those committed by other processes
+    are read back from `users.access_changed_at` at most every
+    `poll_interval` seconds, on the next token check
+    """
+
+    def __init__(self, poll_interval, lifetime_ms, enabled=True):
+        self.poll_interval = poll_interval
+        self.lifetime_ms = lifetime_ms
+        self.enabled = enabled
+        self.polls = 0
+        self.poll_errors = 0
+        self._versions = {}
+        self._since = None
+        self._polled_at = None
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+
+    def revoke(self, user_uuid, version=None):
+        """
+        Reject every token of the user issued before `version`
+        :param user_uuid: UUID|string
+        :param version: Integer - defaults to every token issued until now
+        """
+        now = token_version()
+        version = version if version else now + 1
+        # versions older than the longest token lifetime can't match any token
+        oldest = now - self.lifetime_ms
+
+        with self._lock:
+            for key in [key for key, value in self._versions.items()
+                        if value < oldest]:
+                del self._versions[key]
+            key = str(user_uuid)
+            self._versions[key] = max(self._versions.get(key, 0), version)
+
+    def is_revoked(self, user_uuid, version, session=None):
+        """
+        Checks a token version against the user's minimum version
+        :param user_uuid: UUID|string
+        :param version: Integer - `ver` claim of the token
+        :param session: SQLAlchemy session used to poll, see `refresh`
+        :return: bool
+        """
+        self.refresh(session)
+        return version < self._versions.get(str(user_uuid), 0)
+
+    def refresh(self, session=None, force=False):
+        """
+        Reading the access changes of every process since the last poll,
+        if `poll_interval` has passed. The first poll covers the longest
+        token lifetime. Polls use their own connection, outside of the
+        session's transaction
+        :param session: SQLAlchemy session whose engine is polled
+        :param force: Boolean - poll even if the last poll is recent
+        """
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        if not force and self._polled_at is not None and \
+                now - self._polled_at < self.poll_interval:
+            return
+
+        # one thread polls, the others keep using the current table
+        if not self._poll_lock.acquire(blocking=False):
+            return
+
+        try:
+            started = datetime.utcnow()
+            since = self._since or \
+                started - timedelta(milliseconds=self.lifetime_ms)
+            engine = unwrap_session(session).get_bind()
+            with engine.connect() as connection:
+                rows = connection.execute(
+                    _USERS.select().where(
+                        _USERS.c.access_changed_at > since)).fetchall()
+
+            for row in rows:
+                self.revoke(row.uuid, get_version(row.access_changed_at) + 1)
+            self._since = started - timedelta(seconds=POLL_OVERLAP_SECONDS)
+            self.polls += 1
+        except SQLAlchemyError as err:
+            self.poll_errors += 1
+            logger.error('revocation poll failed: %s', err)
+        finally:
+            self._polled_at = now
+            self._poll_lock.release()
+
+    def stats(self):
+        """ Table size and polls """
+        return dict(size=len(self._versions), polls=self.polls,
+                    poll_errors=self.poll_errors,
+                    poll_interval=self.poll_interval)
+
+
+revocations = RevocationTable(  # pylint:disable=invalid-name
+    config.REVOCATION_POLL_SECONDS,
+    config.JWT_REFRESH_TOKEN_TIMEOUT_MINUTES * 60 * 1000,
+    enabled=config.JWT_EMBED_CLAIMS)
+
+metrics.register('revocation', revocations.stats)
+
+
+def revoke_tokens(user_uuid):
+    """
+    Reject every token of the user issued until now, in this process
+    :param user_uuid: UUID|string
+    """
+    revocations.revoke(user_uuid)
+
+
+def is_revoked(user_uuid, version):
+    """
+    Checks a token version against the user's minimum version
+    :param user_uuid: UUID|string
+    :param version: Integer - `ver` claim of the token
+    :return: bool
+    """
+    return revocations.is_revoked(user_uuid, version)
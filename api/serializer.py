@@ -1,13 +1,98 @@
 """ Custom JSON serializer """
+import datetime
+import enum
 import json
-from .encoder import JSONEncoder
+from decimal import Decimal
+from uuid import UUID
+
+import config
+from api.db.base import Base
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # pylint:disable=invalid-name
+
+BACKEND_ORJSON = 'orjson'
+BACKEND_JSON = 'json'
+
+
+def to_json(obj):
+    """
+    JSON-serializable version of a value the JSON backends can't encode
+    :param obj: value
+    :return: JSON-serializable value
+    :raises: TypeError for unsupported types
+    """
+    if isinstance(obj, Base):
+        return obj.serialize()
+
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat(timespec='milliseconds')
+
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+
+    if isinstance(obj, Decimal):
+        return float(obj)
+
+    if isinstance(obj, enum.Enum):
+        return obj.value
+
+    if isinstance(obj, UUID):
+        return str(obj)
+
+    raise TypeError('Object of type {} is not JSON serializable'.format(
+        obj.__class__.__name__))
+
+
+def get_backend():
+    """
+    JSON backend in use: `JSON_BACKEND` (`auto` picks orjson when installed)
+    :return: BACKEND_ORJSON|BACKEND_JSON
+    """
+    if orjson is not None and config.JSON_BACKEND in ('auto', BACKEND_ORJSON):
+        return BACKEND_ORJSON
+    return BACKEND_JSON
+
+
+BACKEND = get_backend()
+
+# datetimes go through `to_json` to keep millisecond precision
+_ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS \
+    if orjson is not None else 0
+
+
+def fast_encode(value, sort_keys=False):
+    """
+    Encoding with orjson, with the same output rules as `to_json`.
+    Non-ASCII characters are written as raw UTF-8, never escaped
+    :param value: JSON-serializable value
+    :param sort_keys: Boolean
+    :return: string, None without orjson or for values it can't encode
+             (e.g. integers over 64 bits)
+    """
+    if BACKEND != BACKEND_ORJSON:
+        return None
+
+    options = _ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    try:
+        return orjson.dumps(value, default=to_json,
+                            option=options).decode('utf-8')
+    except orjson.JSONEncodeError:
+        return None
 
 
 def encode(value):
-    """ Custom JSON encoder """
-    return json.dumps(value, cls=JSONEncoder)
+    """ Custom JSON encoder, non-ASCII as raw UTF-8 with either backend """
+    result = fast_encode(value)
+    if result is not None:
+        return result
+    return json.dumps(value, default=to_json, ensure_ascii=False)
 
 
 def decode(value):
     """ Custom JSON decoder """
+    if BACKEND == BACKEND_ORJSON:
+        return orjson.loads(value)
     return json.loads(value)
@@ -0,0 +1,81 @@
+""" Streaming JSON responses """
+from itertools import islice
+
+from flask import Response, request, stream_with_context
+
+import config
+from api import serializer
+
+JSON_MIMETYPE = 'application/json'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_ndjson():
+    """ NDJSON negotiated through the `Accept` header """
+    best = request.accept_mimetypes.best_match([JSON_MIMETYPE,
+                                                NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def _chunks(rows, chunk_size):
+    """ Encoded rows, `chunk_size` at a time """
+    rows = iter(rows)
+    while True:
+        chunk = [serializer.encode(row) for row in islice(rows, chunk_size)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def json_array_chunks(rows, json_key=None,
+                      chunk_size=config.STREAM_CHUNK_SIZE):
+    """
+    Encoding rows incrementally as a JSON array, wrapped in
+    `{json_key: [...]}` when a key is given
+    :param rows: iterable of JSON-serializable rows
+    :param json_key: String
+    :param chunk_size: Integer - rows encoded per yielded piece
+    :return: generator of strings
+    """
+    opening = '{%s:[' % serializer.encode(json_key) if json_key else '['
+    closing = ']}' if json_key else ']'
+
+    prefix = opening
+    for chunk in _chunks(rows, chunk_size):
+        yield prefix + ','.join(chunk)
+        prefix = ','
+
+    yield closing if prefix == ',' else opening + closing
+
+
+def ndjson_chunks(rows, chunk_size=config.STREAM_CHUNK_SIZE):
+    """
+    Encoding rows incrementally as newline delimited JSON
+    :param rows: iterable of JSON-serializable rows
+    :param chunk_size: Integer - rows encoded per yielded piece
+    :return: generator of strings
+    """
+    for chunk in _chunks(rows, chunk_size):
+        yield '\n'.join(chunk) + '\n'
+
+
+def stream_response(rows, json_key=None, status_code=200, ndjson=None):
+    """
+    Chunked response encoding `rows` as they are produced, as a JSON array
+    (`{json_key: [...]}`) or as NDJSON when negotiated
+    :param rows: iterable of JSON-serializable rows, e.g. `stream_select`
+    :param json_key: String - envelope key of the JSON array
+    :param status_code: Integer
+    :param ndjson: Boolean - defaults to `Accept` header negotiation
+    :return: HTTP response
+    """
+    if ndjson is None:
+        ndjson = wants_ndjson()
+
+    if ndjson:
+        body, mimetype = ndjson_chunks(rows), NDJSON_MIMETYPE
+    else:
+        body, mimetype = json_array_chunks(rows, json_key), JSON_MIMETYPE
+
+    return Response(stream_with_context(body), status=status_code,
+                    mimetype=mimetype)
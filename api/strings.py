@@ -5,6 +5,9 @@ STATUS_TOKEN_EXPIRED = '419 Authentication Timeout'
 
 # common response
 RETRIEVED_SUCCESS = "Retrieved successfully!"
+SERVICE_BUSY = "Service is busy, please retry later"
+QUERY_TIMEOUT = "Query timed out"
+PRECONDITION_FAILED = "Resource has been modified"
 
 # Validation
 INVALID_CREDENTIAL = "Invalid Credentials"
@@ -17,7 +20,11 @@ INVALID_EMAIL = "Invalid email format"
 INVALID_REFERRAL_CODE = "Invalid referral code"
 ALREADY_INVITED = '{} is already invited'
 INVALID_DAY = 'Invalid Day'
-INVALID_UUID_LIST = 'Invalid {} uuid(s)'
+INVALID_UUIDS = 'Invalid {} uuid(s): {}'
+INVALID_CURSOR = 'Invalid pagination cursor'
+INVALID_SORT_FIELD = 'Invalid sort field {}'
+INVALID_FIELDS = 'Invalid field(s): {}'
+DELETED_RECORD_EXISTS = 'A deleted {} with the same {} exists'
 
 # Auth
 UNAUTHORIZED = "Unauthorized"
@@ -25,6 +32,8 @@ INVALID_TOKEN = "Invalid token"
 TOKEN_EXPIRED = "Authentication Timeout"
 TOKEN_MISSING = "Token missing"
 USED_TOKEN = "Token already used"
+TOKEN_REVOKED = "Token revoked"
+USER_INACTIVE = "User is inactive"
 INCORRECT_OLD_PASSWORD = "Incorrect old password"
 SAME_NEW_PASSWORD = "New password should not be same as old password"
 PASSWORD_LENGTH_ERR = "Make sure your password is at lest 8 letters"
@@ -46,3 +55,7 @@ EMAIL_NOT_EXISTS = "Given email doest not exists"
 EMAIL_SENDING_FAILED = "Email sending failed"
 EMAIL_ROLE_NOT_EXISTS = "Email with this role not exists"
 USER_PHONE_NUMBER_EXISTS = 'User with this phone number already exists'
+USER_EXISTS = 'User with this email or phone number already exists'
+INVALID_AGE = 'Invalid age'
+FIELD_TOO_LONG = '{} is too long'
+INVALID_IMPORT_FORMAT = 'Import data must be CSV (text/csv) or NDJSON'
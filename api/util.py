@@ -2,85 +2,86 @@ import datetime
 from functools import wraps
 
 from flask import request
-from flask_sqlalchemy_session import current_session
-from sqlalchemy.orm.exc import NoResultFound
 from werkzeug.exceptions import BadRequest
+from werkzeug.http import quote_etag
 
-from api.errors import NotFoundError
+from api import strings
+from api.compression import strip_coding
+from api.errors import PreconditionFailedError
 
+# fetch helpers live in `api.db.util` (cached statements), kept importable here
+from api.db.util import (fetch, fetch_all,  # pylint:disable=unused-import
+                         fetch_by_filter, fetch_all_by_filter,
+                         get_query_by_filter)
 
-def fetch(cls, uuid, session=None):
-    """ Fetches an item from the database
 
-    Args:
-        cls (Base): Model class
-        uuid (UUID|string): the uuid value of the item to fetch
-
-    Returns:
-        (cls): object of the specified class
-
-    Raises:
-        (NotFoundError)
+def no_content_response():
     """
-    session = session if session else current_session
-
-    try:
-        return session.query(cls).filter_by(uuid=uuid, deleted_at=None).one()
-    except NoResultFound:
-        raise NotFoundError('{} not found'.format(cls.__name__))
-
-
-def fetch_all(cls, session=None, order_by=None):
-    """ Fetches all items from the database
+    Common response for delete API
+    :return: HTTP response
+    """
+    return '', 204, {'content-type': 'application/json'}
 
-    Args:
-        cls (Base): Model class
 
-    Returns:
-        (cls): object list of the specified class
+def get_etag(obj):
+    """
+    Entity tag of a versioned model instance
+    :param obj: BaseModel object
+    :return: String - unquoted etag
     """
-    return fetch_all_by_filter(cls, dict(), session=session, order_by=order_by)
+    return '{}-{}'.format(obj.uuid, obj.version_id)
 
 
-def fetch_by_filter(cls, args, session=None):
+def etag_headers(etag):
     """
-     Fetches the first filtered item from the database
-    :param cls: (Base) Model class
-    :param args: dict of filters
-    :return: object of the specified class
+    Response headers carrying an etag
+    :param etag: String - unquoted etag
+    :return: dict
     """
-    session = session if session else current_session
-    return session.query(cls).filter_by(**args, deleted_at=None).first()
+    return {'ETag': quote_etag(etag)}
 
 
-def fetch_all_by_filter(cls, args, session=None, order_by=None):
+def _find_etag(etags, etag, weak=False):
     """
-     Fetches all filtered items from the database
-    :param cls: (Base) Model class
-    :param args: dict of filters
-    :return: object list of the specified class
+    Tag of a conditional request header matching `etag`, in any content
+    coding (see `api.compression.coded_etag`)
+    :param etags: ETags of the header
+    :param etag: String - unquoted etag
+    :param weak: Boolean - weak comparison
+    :return: String - the matching tag, or None
     """
-    query = get_query_by_filter(cls, args, session=session, order_by=order_by)
-    return query.all()
+    if etags.star_tag:
+        return etag
 
+    for tag in etags.as_set(include_weak=weak):
+        if strip_coding(tag) == etag:
+            return tag
 
-def get_query_by_filter(cls, args, session=None, order_by=None):
-    """ Get a query for a filter """
-    session = session if session else current_session
-    query = session.query(cls).filter_by(**args, deleted_at=None)
+    return None
 
-    if order_by:
-        query = query.order_by(order_by)
 
-    return query
+def not_modified_response(etag):
+    """
+    `304 Not Modified` if the request's `If-None-Match` has `etag`, carrying
+    the matching tag
+    :param etag: String - unquoted etag
+    :return: HTTP response or None
+    """
+    matched = _find_etag(request.if_none_match, etag, weak=True)
+    if matched is not None:
+        return '', 304, etag_headers(matched)
 
+    return None
 
-def no_content_response():
+
+def validate_if_match(etag):
     """
-    Common response for delete API
-    :return: HTTP response
+    Rejecting the request if its `If-Match` does not have `etag`
+    :param etag: String - unquoted etag
+    :return: Exception if error
     """
-    return '', 204, {'content-type': 'application/json'}
+    if request.if_match and _find_etag(request.if_match, etag) is None:
+        raise PreconditionFailedError(strings.PRECONDITION_FAILED)
 
 
 def get_auth_exp(timeout_in_minutes):
@@ -6,7 +6,10 @@ import config
 from api import strings
 from api.errors import UnauthorizedError
 from api.models import User
-from api.util import fetch_by_filter
+
+SIGNUP_REQUIRED_FIELDS = (('email', strings.EMAIL_MISSING),
+                          ('password', strings.PASSWORD_MISSING),
+                          ('phone_no', strings.PHONE_NO_MISSING))
 
 
 def validate_credentials(user, password):
@@ -50,14 +53,3 @@ def validate_password_terms(password):
             raise BadRequest(strings.PASSWORD_SMALL_ERR)
         break
 
-
-def validate_unique_user_by_role(phone_no, role):
-    """
-    Validating users phone_no with role unique together
-    :param role: UserRoleEnum
-    :param phone_no: String
-    :return: Exception if error
-    """
-    if fetch_by_filter(User, dict(phone_no=str(phone_no),
-                                  role=role.value)):
-        raise BadRequest(strings.USER_PHONE_NUMBER_EXISTS)
@@ -1,3 +1,4 @@
+from .metrics_blueprint import metrics_blueprint
 from .user_blueprint import user_blueprint
 
-BLUEPRINTS = (user_blueprint,)
+BLUEPRINTS = (user_blueprint, metrics_blueprint)
@@ -0,0 +1,21 @@
+""" Metrics Blueprint """
+
+from flask import jsonify
+
+from api import metrics
+from api.auth import has_role
+from api.blueprint import Blueprint
+from api.models.users import UserRoleEnum
+
+metrics_blueprint = Blueprint('metrics',  # pylint: disable=invalid-name
+                              __name__)
+
+
+@metrics_blueprint.route('/metrics', methods=['GET'])
+def snapshot():
+    """
+    In-process metrics (caches, pools, queues) of this worker
+    :return: dict of metrics
+    """
+    has_role(UserRoleEnum.ADMIN)
+    return jsonify(metrics=metrics.snapshot())
@@ -1,30 +1,29 @@
 """ User Blueprint """
+from datetime import datetime
 
 from flask import request, jsonify
 from validate_email import validate_email as is_valid_email
 from werkzeug.exceptions import BadRequest
 
 from api import strings, rest as REST
-from api.auth import has_access
+from api.auth import has_access, has_role, current_user, get_token_claims
 from api.blueprint import Blueprint
+from api.db.write_behind import write_behind
 from api.helpers.user import (create_user,
                               generate_jwt)
+from api.helpers.user_import import import_users, FORMAT_MIMETYPES
 from api.models.users import User, UserRoleEnum
 from api.util import (requires_json,
                       parse_payload,
                       validate_payload_fields)
-from api.validators.users import (validate_credentials,
+from api.validators.users import (SIGNUP_REQUIRED_FIELDS,
+                                  validate_credentials,
                                   validate_password_terms,
-                                  cleanup_edit_payload,
-                                  validate_unique_user_by_role)
+                                  cleanup_edit_payload)
 
 user_blueprint = Blueprint('user',  # pylint: disable=invalid-name
                            __name__, api_prefix='users')
 
-SIGNUP_REQUIRED_FIELDS = (('email', strings.EMAIL_MISSING),
-                          ('password', strings.PASSWORD_MISSING),
-                          ('phone_no', strings.PHONE_NO_MISSING))
-
 
 @user_blueprint.route('/signup', methods=['POST'])
 @requires_json
@@ -41,13 +40,33 @@ def signup(payload):
 
     password = payload.pop('password')
     validate_password_terms(password)
-    validate_unique_user_by_role(payload['phone_no'], UserRoleEnum.PARENT)
 
     user = create_user(payload, UserRoleEnum.PARENT, password)
 
     return jsonify(user=user), 201
 
 
+@user_blueprint.route('/import', methods=['POST'], statement_timeout=0)
+def bulk_import():
+    """
+    Import users from a CSV (`text/csv`, with a header row) or NDJSON
+    (`application/x-ndjson`) body; `?role=` defaults to PARENT
+    :return: counts, invalid and conflicting rows
+    """
+    has_role(UserRoleEnum.ADMIN)
+
+    try:
+        role = UserRoleEnum(request.args.get('role',
+                                             UserRoleEnum.PARENT.value))
+    except ValueError:
+        raise BadRequest(strings.INVALID_ROLE)
+
+    result = import_users(request.stream,
+                          FORMAT_MIMETYPES.get(request.mimetype), role)
+
+    return jsonify(result.as_dict())
+
+
 @user_blueprint.route('/login', methods=['POST'])
 def login():
     """
@@ -60,8 +79,10 @@ def login():
 
     user = User.find_by_email(email)
     validate_credentials(user, password)
+    write_behind.enqueue(User, user.uuid, last_login_at=datetime.utcnow())
 
-    return jsonify({**generate_jwt(user.uuid), 'user': user})
+    return jsonify({**generate_jwt(user.uuid, get_token_claims(user)),
+                    'user': user})
 
 
 @user_blueprint.route('/<uuid:uuid>', methods=['GET'])
@@ -71,7 +92,9 @@ def details(uuid):
     :return: User object
     """
     has_access(uuid)
-    return jsonify(user=request.user)
+    write_behind.enqueue(User, request.principal.uuid,
+                         last_seen_at=datetime.utcnow())
+    return REST.get(User, uuid, 'user', obj=current_user())
 
 
 @user_blueprint.route('/<uuid:uuid>', methods=['PUT', 'PATCH'])
@@ -85,7 +108,7 @@ def edit(uuid):
     has_access(uuid)
     payload = cleanup_edit_payload(payload)
 
-    return REST.update(User, uuid, payload, 'user', obj=request.user)
+    return REST.update(User, uuid, payload, 'user', obj=current_user())
 
 
 @user_blueprint.route('/<uuid:uuid>', methods=['DELETE'])
@@ -99,4 +122,4 @@ def delete(uuid):
     # Add message
     has_access(uuid)
 
-    return REST.delete(User, uuid, obj=request.user)
+    return REST.delete(User, uuid, obj=current_user())
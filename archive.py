@@ -0,0 +1,34 @@
+''' Move soft deleted rows into <table>_archive tables '''
+import argparse
+
+import config
+from api.db.session import engine
+from api.db.archive import archive_all
+import api.models # pylint:disable=unused-import
+
+
+def parse_args():
+    ''' Command line options '''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--table', action='append', dest='tables',
+                        help='table to archive (repeatable), default all')
+    parser.add_argument('--days', type=int, default=config.ARCHIVE_AFTER_DAYS,
+                        help='archive rows soft deleted more than DAYS ago')
+    parser.add_argument('--batch-size', type=int,
+                        default=config.ARCHIVE_BATCH_SIZE,
+                        help='rows moved per transaction')
+    parser.add_argument('--pause', type=float,
+                        default=config.ARCHIVE_PAUSE_SECONDS,
+                        help='seconds to sleep between batches')
+    parser.add_argument('--max-batches', type=int, default=None,
+                        help='stop after this many batches per table')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    ARGS = parse_args()
+    RESULT = archive_all(engine, tables=ARGS.tables, days=ARGS.days,
+                         batch_size=ARGS.batch_size, pause=ARGS.pause,
+                         max_batches=ARGS.max_batches)
+    for name, count in RESULT.items():
+        print('{}: {} rows archived'.format(name, count))
@@ -0,0 +1,54 @@
+""" Per-call overhead of the fetch helpers with and without cached statements
+
+    python -m benchmarks.fetch_benchmark [iterations]
+
+Runs against in-memory SQLite so the numbers are dominated by query
+construction/compilation rather than the database round trip.
+"""
+import sys
+import timeit
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import config
+from api.db.base import Base
+from api.db.util import fetch, fetch_by_filter, fetch_by_ids
+from api.models import User, UserRoleEnum
+
+
+def _session():
+    """ session with a single user """
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    user = User(email='bench@example.com', phone_no='1234567890',
+                role=UserRoleEnum.PARENT.value)
+    session.add(user)
+    session.commit()
+    return session, user.uuid, user.email
+
+
+def run(iterations):
+    """ print microseconds per call for each helper """
+    session, uuid, email = _session()
+    calls = (
+        ('fetch', lambda: fetch(User, uuid, session)),
+        ('fetch_by_filter', lambda: fetch_by_filter(
+            User, dict(email=email, role=UserRoleEnum.PARENT.value), session)),
+        ('fetch_by_ids', lambda: fetch_by_ids(User, [uuid], session)),
+    )
+
+    print('{:<16} {:>12} {:>12}'.format('helper', 'uncached us', 'cached us'))
+    for name, call in calls:
+        timings = []
+        for enabled in (False, True):
+            config.DB_QUERY_CACHE_ENABLED = enabled
+            call()  # warm up
+            seconds = timeit.timeit(call, number=iterations)
+            timings.append(seconds / iterations * 1e6)
+        print('{:<16} {:>12.1f} {:>12.1f}'.format(name, *timings))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
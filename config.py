@@ -21,13 +21,40 @@ TEST_DB_URL = 'postgresql://{}:{}@{}:{}/{}'.format(
     os.getenv('POSTGRES_TEST_PORT', '5432'),
     os.getenv('POSTGRES_TEST_DB', ''))
 
+# comma separated read replica URLs, GET/HEAD requests read from them
+DB_REPLICA_URLS = [url for url in os.getenv('DB_REPLICA_URLS', '').split(',')
+                   if url]
+
 DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
-DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '-1'))
+# connections opened past the pool size under load; -1 is unbounded
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+# seconds a request waits for a connection before failing with a 503
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '5'))
+DB_POOL_RETRY_AFTER_SECONDS = int(
+    os.getenv('DB_POOL_RETRY_AFTER_SECONDS', '1'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = bool(os.getenv('DB_POOL_PRE_PING', 'True') == 'True')
+# default statement_timeout (ms) of a transaction, 0 is none; routes can
+# override it with `statement_timeout`
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0'))
+DB_QUERY_CACHE_ENABLED = bool(
+    os.getenv('DB_QUERY_CACHE_ENABLED', 'True') == 'True')
+DB_QUERY_CACHE_SIZE = int(os.getenv('DB_QUERY_CACHE_SIZE', '200'))
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '1000'))
+DELETE_BULK_CHUNK_SIZE = int(os.getenv('DELETE_BULK_CHUNK_SIZE', '1000'))
+# one transaction (single COMMIT) per request instead of one per save
+DB_REQUEST_TRANSACTION = bool(
+    os.getenv('DB_REQUEST_TRANSACTION', 'False') == 'True')
 
 # API
 API_PREFIX = os.getenv('API_PREFIX', '/api/v')
 REFERRAL_CODE_LENGTH = 6
 JSON_SORT_KEYS = False
+# non-ASCII characters as raw UTF-8, like orjson writes them; True escapes
+# them (\uXXXX) and encodes responses with the stdlib encoder
+JSON_AS_ASCII = bool(os.getenv('JSON_AS_ASCII', 'False') == 'True')
+# auto (orjson when installed) | orjson | json
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
 
 # Auth
 JWT_ALGORITHM = "HS256"
@@ -41,7 +68,66 @@ JWT_ACCESS_TOKEN_TIMEOUT_MINUTES = int(
     os.getenv('JWT_ACCESS_TOKEN_TIMEOUT_MINUTES', '60'))
 JWT_REFRESH_TOKEN_TIMEOUT_MINUTES = int(
     os.getenv('JWT_REFRESH_TOKEN_TIMEOUT_MINUTES', '600'))
+# embed signed role/status claims so authorization needs no database
+JWT_EMBED_CLAIMS = bool(os.getenv('JWT_EMBED_CLAIMS', 'False') == 'True')
+# how often each process reads the token revocations of the other processes
+REVOCATION_POLL_SECONDS = float(os.getenv('REVOCATION_POLL_SECONDS', '5'))
 ENABLE_AUTH = bool(os.getenv('ENABLE_AUTH', 'False') == 'True')
 PASSWORD_LENGTH = int(os.getenv('PASSWORD_LENGTH', '8'))
 DEFAULT_PAGINATION_LIMIT = 15
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '1000'))
+# stream `rest.get_list*` responses chunk by chunk instead of one body
+STREAM_LISTS = bool(os.getenv('STREAM_LISTS', 'False') == 'True')
+# exact | window | estimate | cached
+DEFAULT_COUNT_STRATEGY = os.getenv('DEFAULT_COUNT_STRATEGY', 'exact')
+COUNT_CACHE_SIZE = int(os.getenv('COUNT_CACHE_SIZE', '1000'))
+COUNT_CACHE_TTL_SECONDS = int(os.getenv('COUNT_CACHE_TTL_SECONDS', '60'))
+SEARCH_CANDIDATE_LIMIT = int(os.getenv('SEARCH_CANDIDATE_LIMIT', '1000'))
+# rows hashed and COPYed at a time by the bulk user import
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
 PATH_TO_MIGRATIONS = 'migrations'
+
+# Authenticated user (principal) cache
+AUTH_CACHE_ENABLED = bool(os.getenv('AUTH_CACHE_ENABLED', 'True') == 'True')
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', '10000'))
+AUTH_CACHE_TTL_SECONDS = int(os.getenv('AUTH_CACHE_TTL_SECONDS', '30'))
+
+# Password hashing (bcrypt) process pool; 0 workers means one per core
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+HASH_POOL_ENABLED = bool(os.getenv('HASH_POOL_ENABLED', 'True') == 'True')
+HASH_POOL_WORKERS = int(os.getenv('HASH_POOL_WORKERS', '0'))
+HASH_QUEUE_SIZE = int(os.getenv('HASH_QUEUE_SIZE', '64'))
+HASH_TIMEOUT_SECONDS = int(os.getenv('HASH_TIMEOUT_SECONDS', '10'))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv('HASH_RETRY_AFTER_SECONDS', '1'))
+
+# Write-behind queue for non-critical updates (last login/seen timestamps)
+WRITE_BEHIND_ENABLED = bool(
+    os.getenv('WRITE_BEHIND_ENABLED', 'True') == 'True')
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv('WRITE_BEHIND_QUEUE_SIZE', '10000'))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', '500'))
+WRITE_BEHIND_INTERVAL_SECONDS = float(
+    os.getenv('WRITE_BEHIND_INTERVAL_SECONDS', '1'))
+
+# Archival of soft deleted rows into <table>_archive
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '30'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+ARCHIVE_PAUSE_SECONDS = float(os.getenv('ARCHIVE_PAUSE_SECONDS', '0.5'))
+
+# Response compression, negotiated from Accept-Encoding (in order of
+# preference; br and zstd need the brotli/zstandard packages)
+COMPRESS_ENABLED = bool(os.getenv('COMPRESS_ENABLED', 'True') == 'True')
+COMPRESS_ALGORITHMS = [
+    algorithm.strip() for algorithm in os.getenv(
+        'COMPRESS_ALGORITHMS', 'br,zstd,gzip,deflate').split(',')
+    if algorithm.strip()]
+COMPRESS_MIMETYPES = [
+    mimetype.strip() for mimetype in os.getenv(
+        'COMPRESS_MIMETYPES',
+        'application/json,application/x-ndjson,text/csv,text/plain,'
+        'text/html').split(',')
+    if mimetype.strip()]
+# smaller (non streamed) bodies are sent as is
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '500'))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+COMPRESS_BR_LEVEL = int(os.getenv('COMPRESS_BR_LEVEL', '4'))
+COMPRESS_ZSTD_LEVEL = int(os.getenv('COMPRESS_ZSTD_LEVEL', '3'))
@@ -0,0 +1,32 @@
+''' Import users from a CSV or NDJSON file '''
+import argparse
+import json
+
+from api.db.session import session_factory
+from api.helpers.user_import import import_users, FORMATS
+from api.models import UserRoleEnum
+
+
+def parse_args():
+    ''' Command line options '''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', help='CSV (with a header row) or NDJSON file')
+    parser.add_argument('--format', choices=FORMATS, default=None,
+                        help='file format, guessed from the extension')
+    parser.add_argument('--role', default=UserRoleEnum.PARENT.value,
+                        choices=[role.value for role in UserRoleEnum])
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    ARGS = parse_args()
+    FORMAT = ARGS.format or ('csv' if ARGS.path.endswith('.csv')
+                             else 'ndjson')
+    SESSION = session_factory()
+    try:
+        with open(ARGS.path, 'rb') as stream:
+            RESULT = import_users(stream, FORMAT, UserRoleEnum(ARGS.role),
+                                  session=SESSION)
+    finally:
+        SESSION.close()
+    print(json.dumps(RESULT.as_dict(), indent=2))
@@ -6,9 +6,12 @@ import pytest
 import forgery_py
 import string
 
+from flask import Flask
 from flask_sqlalchemy_session import flask_scoped_session
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 import config
 from api import app as _app
@@ -58,6 +61,91 @@ def tables(engine):
     Base.metadata.drop_all(engine)
 
 
+def create_sqlite_engine():
+    """ in-memory sqlite engine with every table, usable from any thread """
+    _engine = create_engine('sqlite://', poolclass=StaticPool,
+                            connect_args={'check_same_thread': False})
+    Base.metadata.create_all(_engine)
+    return _engine
+
+
+@pytest.fixture
+def sqlite_engine():
+    """ in-memory sqlite engine for tests that don't need PostgreSQL """
+    _engine = create_sqlite_engine()
+    yield _engine
+    _engine.dispose()
+
+
+@pytest.fixture
+def sqlite_session(sqlite_engine):
+    """ session of the in-memory sqlite database """
+    _session = sessionmaker(bind=sqlite_engine)()
+    yield _session
+    _session.close()
+
+
+@pytest.fixture
+def sqlite_app(sqlite_engine):
+    """ bare app whose `current_session` is the sqlite database """
+    _app = Flask(__name__)
+    _app.db_session = flask_scoped_session(sessionmaker(bind=sqlite_engine),
+                                           _app)
+    return _app
+
+
+# every user written by the PostgreSQL-backed tests, removed after each test
+PG_EMAIL_DOMAIN = 'pg.example.com'
+
+
+@pytest.fixture(scope='session')
+def pg_engine():
+    """ test database engine, skipping the test without a PostgreSQL server """
+    _engine = create_engine(config.TEST_DB_URL, **engine_options)
+    try:
+        _engine.connect().close()
+    except OperationalError:
+        pytest.skip('PostgreSQL test database is not available')
+    Base.metadata.create_all(_engine)
+    yield _engine
+    _engine.dispose()
+
+
+@pytest.fixture
+def pg_session(pg_engine):
+    """ session of the PostgreSQL test database """
+    _session = sessionmaker(bind=pg_engine)()
+    yield _session
+    _session.rollback()
+    _session.execute(text('DELETE FROM users WHERE email LIKE :pattern'),
+                     dict(pattern='%@' + PG_EMAIL_DOMAIN))
+    _session.commit()
+    _session.close()
+
+
+@pytest.fixture
+def pg_app(pg_engine, pg_session):
+    """ bare app whose `current_session` is the PostgreSQL test database """
+    _app = Flask(__name__)
+    _app.db_session = flask_scoped_session(sessionmaker(bind=pg_engine),
+                                           _app)
+    return _app
+
+
+def make_pg_row(index, **columns):
+    """ users row of the PostgreSQL-backed tests """
+    return dict(dict(email='user{}@{}'.format(index, PG_EMAIL_DOMAIN),
+                     phone_no='555{:05d}'.format(index),
+                     role=UserRoleEnum.PARENT.value), **columns)
+
+
+def make_user(index, **columns):
+    """ unsaved parent user{index}@example.com with phone number `index` """
+    columns.setdefault('email', 'user{}@example.com'.format(index))
+    return User(phone_no=str(index), role=UserRoleEnum.PARENT.value,
+                **columns)
+
+
 @pytest.fixture(scope='session')
 def session(app):
     """Get a test session for your Flask app"""
@@ -0,0 +1,54 @@
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from api.db.archive import (_archive_statement, _create_archive_table,
+                            archivable_tables)
+from api.models import User
+
+
+class _Connection:
+    """ records the statements instead of running them (PostgreSQL only) """
+    dialect = postgresql.dialect()
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, stmt):
+        self.statements.append(str(stmt))
+
+
+def test_archivable_tables():
+    """ every soft deleting table """
+    assert User.__table__ in archivable_tables()
+
+
+def test_archive_statement_lists_columns():
+    """ rows are moved column by column, by name """
+    stmt = ' '.join(str(_archive_statement(_Connection.dialect,
+                                           User.__table__)).split())
+
+    assert '*' not in stmt
+    assert 'INSERT INTO users_archive (uuid, deleted_at, ' in stmt
+    assert ', access_changed_at) SELECT uuid, deleted_at, ' in stmt
+
+
+def test_archive_table_gets_new_columns():
+    """ columns added to the table are added to its archive """
+    connection = _Connection()
+    _create_archive_table(connection, User.__table__)
+
+    assert connection.statements[0].startswith(
+        'CREATE TABLE IF NOT EXISTS users_archive (LIKE users')
+    assert 'ALTER TABLE users_archive ADD COLUMN IF NOT EXISTS ' \
+        'access_changed_at TIMESTAMP WITH TIME ZONE' in connection.statements
+    assert len(connection.statements) == len(User.__table__.columns) + 1
+
+
+def test_deleted_rows_index():
+    """ the archival batches read soft deleted rows by `deleted_at` """
+    index, = [index for index in User.__table__.indexes
+              if index.name == 'ix_users_deleted_at']
+
+    assert str(CreateIndex(index).compile(dialect=postgresql.dialect())) == \
+        'CREATE INDEX ix_users_deleted_at ON users (deleted_at) ' \
+        'WHERE deleted_at IS NOT NULL'
@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import event
+
+from api.db.commit import atomic
+from api.models import User
+from tests.conftest import make_user as _user
+
+
+@pytest.fixture
+def commits(sqlite_session):
+    """ COMMITs issued on the sqlite database """
+    committed = []
+    event.listen(sqlite_session.bind, 'commit', committed.append)
+    return committed
+
+
+def test_atomic_commits_once(sqlite_session, commits):
+    """ saves inside the block share a single COMMIT """
+    with atomic(sqlite_session):
+        for index in range(3):
+            _user(index).save(sqlite_session)
+
+    assert len(commits) == 1
+    assert sqlite_session.query(User).count() == 3
+
+
+def test_atomic_rolls_back_on_error(sqlite_session, commits):
+    """ an error inside the block discards every save """
+
+    @atomic(sqlite_session)
+    def create_and_fail():
+        _user(1).save(sqlite_session)
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        create_and_fail()
+
+    assert not commits
+    assert sqlite_session.query(User).count() == 0
+
+
+@pytest.fixture
+def committed(monkeypatch):
+    """ users whose `after_commit` hook ran """
+    calls = []
+    monkeypatch.setattr(User, 'after_commit', lambda user: calls.append(user))
+    return calls
+
+
+def test_after_commit_waits_for_commit(sqlite_session, committed):
+    """ hooks of saves inside the block run after the COMMIT """
+    with atomic(sqlite_session):
+        user = _user(1)
+        user.save(sqlite_session)
+        assert not committed
+
+    assert committed == [user]
+
+
+def test_after_commit_dropped_on_rollback(sqlite_session, committed):
+    """ hooks of a rolled back block never run """
+    with pytest.raises(ValueError):
+        with atomic(sqlite_session):
+            _user(1).save(sqlite_session)
+            raise ValueError()
+
+    _user(2).save(sqlite_session)
+    assert [user.phone_no for user in committed] == ['2']
@@ -0,0 +1,278 @@
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from werkzeug.exceptions import BadRequest
+
+from api import rest
+from api.db.bulk import (CONFLICT_FAIL, CONFLICT_IGNORE, CONFLICT_UPDATE,
+                         _key_conflicts, bulk_upsert,
+                         _upsert_statement, get_conflict_target,
+                         get_conflict_where, get_covering_conflict_target)
+from api.db.util import get_or_create
+from api.models import User, UserRoleEnum
+from tests.conftest import make_pg_row, make_user
+
+
+@pytest.fixture
+def soft_deleted(monkeypatch):
+    """ `bulk_soft_delete` (PostgreSQL only) finding one existing row """
+    existing = uuid4()
+    monkeypatch.setattr(rest, 'bulk_soft_delete',
+                        lambda cls, uuids: {existing} & set(uuids))
+    return existing
+
+
+def test_delete_bulk(sqlite_app, soft_deleted, monkeypatch):
+    """ the hook gets the deleted uuids once committed """
+    calls = []
+    monkeypatch.setattr(User, 'after_bulk_delete', calls.append)
+
+    with sqlite_app.test_request_context():
+        assert rest.delete_bulk(User, [str(soft_deleted)])[1] == 204
+
+    assert calls == [{soft_deleted}]
+
+
+def test_delete_bulk_reports_every_invalid_uuid(sqlite_app, soft_deleted,
+                                                monkeypatch):
+    """ unparsable and missing uuids are reported together, nothing is
+    deleted """
+    missing = uuid4()
+    monkeypatch.setattr(User, 'after_bulk_delete', pytest.fail)
+
+    with sqlite_app.test_request_context():
+        with pytest.raises(BadRequest) as error:
+            rest.delete_bulk(User, [str(soft_deleted), str(missing), 'junk'])
+
+    assert error.value.description == \
+        'Invalid users uuid(s): junk, {}'.format(missing)
+
+
+def test_conflict_target_of_partial_unique_index():
+    """ `ON CONFLICT` repeats the WHERE clause of a live-rows unique index """
+    table = User.__table__
+    target = get_covering_conflict_target(table, ['phone_no', 'role'])
+    stmt = pg_insert(table).values(phone_no='1', role='PARENT') \
+        .on_conflict_do_nothing(index_elements=target,
+                                index_where=get_conflict_where(table, target))
+
+    assert target == ('phone_no', 'role')
+    assert 'ON CONFLICT (phone_no, role) WHERE deleted_at IS NULL DO NOTHING' \
+        in str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def _row(phone_no, email):
+    return dict(phone_no=phone_no, email=email,
+                role=UserRoleEnum.PARENT.value)
+
+
+@pytest.mark.parametrize('on_conflict, clause', [
+    (CONFLICT_IGNORE, 'ON CONFLICT DO NOTHING'),
+    (CONFLICT_UPDATE,
+     'ON CONFLICT (email, role) WHERE deleted_at IS NULL DO UPDATE')])
+def test_upsert_conflict_clause(on_conflict, clause):
+    """ ignoring skips conflicts on any unique key, updating needs a target """
+    stmt = _upsert_statement(User, [_row('1', 'user@example.com')],
+                             on_conflict, get_conflict_target(User.__table__))
+
+    assert clause in str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_update_conflicts_on_other_keys(sqlite_session):
+    """ rows clashing with another user's phone number can't be updated """
+    sqlite_session.add(make_user(1))
+    sqlite_session.commit()
+    rows = [_row('1', 'user1@example.com'), _row('1', 'other@example.com'),
+            _row('2', 'user2@example.com')]
+
+    assert _key_conflicts(sqlite_session, User.__table__, rows, [0, 1, 2],
+                          ('email', 'role')) == {1}
+
+
+def test_get_or_create(sqlite_session):
+    """ the second call finds the row created by the first """
+    user, created = get_or_create(User, _row('1', 'user@example.com'),
+                                  sqlite_session)
+    again, created_again = get_or_create(User, _row('1', 'user@example.com'),
+                                         sqlite_session)
+
+    assert (created, created_again) == (True, False)
+    assert again.uuid == user.uuid
+
+
+@pytest.mark.parametrize('keys, target', [
+    (['email', 'phone_no', 'role'], ('email', 'role')),
+    (['phone_no', 'role'], ('phone_no', 'role')),
+    (['email', 'age'], None),
+    (['uuid', 'email'], ('uuid',))])
+def test_covering_conflict_target(keys, target):
+    """ the INSERT of `keys` can only conflict on a key it covers """
+    assert get_covering_conflict_target(User.__table__, keys) == target
+
+
+def test_update_records_access_change():
+    """ a bulk status change is recorded for token revocation """
+    row = dict(_row('1', 'user@example.com'), status='INACTIVE')
+    stmt = _upsert_statement(User, [row], CONFLICT_UPDATE,
+                             get_conflict_target(User.__table__))
+    sql = ' '.join(str(stmt.compile(dialect=postgresql.dialect())).split())
+
+    assert 'access_changed_at = CASE WHEN (users.status IS DISTINCT FROM ' \
+        'excluded.status) THEN' in sql
+    assert 'AS access_changed' in sql
+
+
+def test_after_bulk_access_change(monkeypatch):
+    """ cached principals are dropped and tokens revoked """
+    uuid = uuid4()
+    revoked, invalidated = [], []
+    monkeypatch.setattr('api.models.users.revoke_tokens', revoked.append)
+    monkeypatch.setattr('api.models.users.principal_cache.invalidate',
+                        invalidated.append)
+
+    User.after_bulk_access_change({uuid})
+
+    assert (revoked, invalidated) == ([uuid], [str(uuid)])
+
+
+@pytest.fixture
+def existing(pg_session):
+    """ PostgreSQL users 1 (live) and 2 (soft deleted) """
+    bulk_upsert(User, [make_pg_row(1, first_name='one'),
+                       make_pg_row(2, deleted_at=datetime.utcnow())],
+                session=pg_session)
+    return pg_session.query(User).filter_by(phone_no='55500001').one()
+
+
+def _live_users(session):
+    return {user.phone_no: user for user in
+            session.query(User).filter(User.deleted_at.is_(None),
+                                       User.email.like('%@pg.example.com'))}
+
+
+def test_upsert_inserts(pg_session):
+    """ new rows are reported as inserted """
+    result = bulk_upsert(User, [make_pg_row(index) for index in range(3)],
+                         chunk_size=2, session=pg_session)
+
+    assert result.as_dict() == dict(inserted=[0, 1, 2], updated=[],
+                                    skipped=[], conflicted=[])
+    assert len(_live_users(pg_session)) == 3
+
+
+def test_upsert_fail_writes_nothing(pg_session, existing):
+    """ one conflicting row rolls the whole upsert back """
+    result = bulk_upsert(User, [make_pg_row(3), make_pg_row(1)],
+                         on_conflict=CONFLICT_FAIL, session=pg_session)
+
+    assert (result.inserted, result.conflicted) == ([], [1])
+    assert set(_live_users(pg_session)) == {'55500001'}
+
+
+@pytest.mark.parametrize('row', [make_pg_row(1, phone_no='55500009'),
+                                 make_pg_row(9, phone_no='55500001')])
+def test_upsert_ignore(pg_session, existing, row):
+    """ conflicts on any unique key are skipped """
+    result = bulk_upsert(User, [make_pg_row(3), row],
+                         on_conflict=CONFLICT_IGNORE, session=pg_session)
+
+    assert (result.inserted, result.skipped) == ([0], [1])
+    assert set(_live_users(pg_session)) == {'55500001', '55500003'}
+
+
+def test_upsert_update(pg_session, existing):
+    """ a target conflict updates the live row, a deleted one is ignored """
+    result = bulk_upsert(User, [make_pg_row(1, first_name='uno'),
+                                make_pg_row(2, first_name='dos')],
+                         on_conflict=CONFLICT_UPDATE, session=pg_session)
+
+    assert (result.updated, result.inserted) == ([0], [1])
+    pg_session.expire_all()
+    assert existing.first_name == 'uno'
+    assert existing.version_id == 2
+    assert _live_users(pg_session)['55500002'].first_name == 'dos'
+
+
+def test_upsert_update_conflicts_on_other_key(pg_session, existing):
+    """ a row clashing with another user's phone number is reported """
+    result = bulk_upsert(User, [make_pg_row(3),
+                                make_pg_row(4, phone_no='55500001')],
+                         on_conflict=CONFLICT_UPDATE, session=pg_session)
+
+    assert (result.inserted, result.conflicted) == ([0], [1])
+    assert set(_live_users(pg_session)) == {'55500001', '55500003'}
+
+
+def test_upsert_update_revokes_access(pg_session, existing, monkeypatch):
+    """ a bulk deactivation revokes the user's tokens once committed """
+    calls = []
+    monkeypatch.setattr(User, 'after_bulk_access_change', calls.append)
+    rows = [make_pg_row(1, status='INACTIVE')]
+
+    bulk_upsert(User, rows, on_conflict=CONFLICT_UPDATE, session=pg_session)
+    bulk_upsert(User, rows, on_conflict=CONFLICT_UPDATE, session=pg_session)
+
+    pg_session.expire_all()
+    assert calls == [{existing.uuid}]
+    assert existing.access_changed_at is not None
+
+
+@pytest.fixture
+def live_uuids(pg_session):
+    """ uuids of two live PostgreSQL users """
+    bulk_upsert(User, [make_pg_row(1), make_pg_row(2)], session=pg_session)
+    return [user.uuid for user in _live_users(pg_session).values()]
+
+
+def test_pg_delete_bulk(pg_app, pg_session, live_uuids):
+    """ every requested row is soft deleted """
+    with pg_app.test_request_context():
+        assert rest.delete_bulk(User, [str(uuid) for uuid in live_uuids])[1] \
+            == 204
+
+    pg_session.expire_all()
+    assert not _live_users(pg_session)
+    assert all(user.access_changed_at is not None
+               for user in pg_session.query(User).filter(
+                   User.uuid.in_(live_uuids)))
+
+
+def test_pg_delete_bulk_is_all_or_nothing(pg_app, pg_session, live_uuids):
+    """ a missing uuid rolls back the deletes of the others """
+    missing = uuid4()
+    with pg_app.test_request_context():
+        with pytest.raises(BadRequest) as error:
+            rest.delete_bulk(User, [str(uuid) for uuid in live_uuids] +
+                             [str(missing)])
+
+    assert error.value.description == \
+        'Invalid users uuid(s): {}'.format(missing)
+    assert len(_live_users(pg_session)) == 2
+
+
+def test_pg_get_or_create(pg_session):
+    """ the INSERT ... ON CONFLICT path creates, then finds the live row """
+    user, created = get_or_create(User, make_pg_row(1), pg_session)
+    user.first_name = 'one'
+    user.save(pg_session)
+
+    again, created_again = get_or_create(
+        User, make_pg_row(1, first_name='other'), pg_session)
+
+    assert (created, created_again) == (True, False)
+    assert again.uuid == user.uuid
+    assert (again.first_name, again.version_id) == ('one', 2)
+
+
+def test_pg_get_or_create_after_soft_delete(pg_session):
+    """ a soft deleted row doesn't hold on to its unique key """
+    user, _ = get_or_create(User, make_pg_row(1), pg_session)
+    user.delete(pg_session)
+
+    again, created = get_or_create(User, make_pg_row(1), pg_session)
+
+    assert created
+    assert again.uuid != user.uuid
@@ -0,0 +1,47 @@
+import time
+
+from api.cache import TTLCache
+
+
+def test_cache_hit_and_miss():
+    """ counters track lookups """
+    cache = TTLCache(10, 60)
+    cache.set('a', 1)
+
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_lru_eviction():
+    """ the least recently used entry is evicted first """
+    cache = TTLCache(2, 60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_cache_ttl_and_invalidate():
+    """ expired and invalidated entries are misses """
+    cache = TTLCache(10, 0.01)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.invalidate('b')
+    time.sleep(0.02)
+
+    assert cache.get('a') is None
+    assert cache.get('b') is None
+
+
+def test_cache_disabled():
+    """ a disabled cache stores nothing """
+    cache = TTLCache(10, 60, enabled=False)
+    cache.set('a', 1)
+
+    assert cache.get('a') is None
@@ -0,0 +1,84 @@
+import gzip
+import zlib
+
+import pytest
+from flask import Flask, Response, jsonify, request
+
+from api.compression import compression_stats, init_compression
+
+
+@pytest.fixture
+def compressed_client():
+    """ bare app with response compression """
+    app = Flask(__name__)
+    app.config['COMPRESS_ENABLED'] = True
+    init_compression(app)
+
+    @app.route('/big')
+    def big():
+        return jsonify(users=[{'email': 'user@example.com'}] * 200)
+
+    @app.route('/tagged')
+    def tagged():
+        response = jsonify(users=[{'email': 'user@example.com'}] * 200)
+        response.set_etag('abc-3', weak=request.args.get('weak') == '1')
+        return response
+
+    @app.route('/small')
+    def small():
+        return jsonify(ok=True)
+
+    @app.route('/stream')
+    def stream():
+        return Response(('{"index": %d}\n' % index for index in range(500)),
+                        mimetype='application/x-ndjson')
+
+    @app.route('/not-modified')
+    def not_modified():
+        return '', 304
+
+    return app.test_client()
+
+
+def test_compresses_large_bodies(compressed_client):
+    """ bodies from the size threshold are gzipped when accepted """
+    before = compression_stats.responses
+    response = compressed_client.get('/big',
+                                     headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert b'user@example.com' in gzip.decompress(response.data)
+    assert compression_stats.responses == before + 1
+
+
+@pytest.mark.parametrize('path, accept', [
+    ('/small', 'gzip'), ('/big', 'identity'), ('/big', 'gzip;q=0'),
+    ('/not-modified', 'gzip')])
+def test_skips_compression(compressed_client, path, accept):
+    """ small bodies, bodiless responses and refused codings are left as is """
+    response = compressed_client.get(path, headers={'Accept-Encoding': accept})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_compresses_streams_incrementally(compressed_client):
+    """ streamed responses are compressed chunk by chunk """
+    response = compressed_client.get('/stream',
+                                     headers={'Accept-Encoding': 'deflate'})
+
+    assert response.headers['Content-Encoding'] == 'deflate'
+    assert 'Content-Length' not in response.headers
+    lines = zlib.decompress(response.data).decode().splitlines()
+    assert lines[-1] == '{"index": 499}'
+
+
+@pytest.mark.parametrize('query, etag', [('', '"abc-3-gzip"'),
+                                         ('?weak=1', 'W/"abc-3"')])
+def test_compressed_etag(compressed_client, query, etag):
+    """ strong etags differ per content coding, weak ones are shared """
+    response = compressed_client.get('/tagged' + query,
+                                     headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'] == etag
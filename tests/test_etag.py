@@ -0,0 +1,48 @@
+from collections import namedtuple
+
+import pytest
+from flask import Flask
+
+from api.errors import PreconditionFailedError
+from api.util import get_etag, not_modified_response, validate_if_match
+
+Versioned = namedtuple('Versioned', 'uuid version_id')
+
+
+@pytest.fixture
+def etag(random_uuid):
+    """ etag of a versioned object """
+    return get_etag(Versioned(random_uuid, 3))
+
+
+def test_if_none_match(etag):
+    """ a matching `If-None-Match` is answered with a 304 """
+    headers = {'If-None-Match': '"{}"'.format(etag)}
+    with Flask(__name__).test_request_context(headers=headers):
+        assert not_modified_response(etag)[1] == 304
+        assert not_modified_response(etag + '0') is None
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br'])
+def test_compressed_etag(etag, encoding):
+    """ the etag of a compressed representation matches its resource """
+    headers = {'If-None-Match': '"{}-{}"'.format(etag, encoding),
+               'If-Match': '"{}-{}"'.format(etag, encoding)}
+    with Flask(__name__).test_request_context(headers=headers):
+        assert not_modified_response(etag)[2] == \
+            {'ETag': '"{}-{}"'.format(etag, encoding)}
+        validate_if_match(etag)
+        with pytest.raises(PreconditionFailedError):
+            validate_if_match(etag + '0')
+
+
+def test_if_match(etag):
+    """ a stale `If-Match` is rejected """
+    headers = {'If-Match': '"{}"'.format(etag)}
+    with Flask(__name__).test_request_context(headers=headers):
+        validate_if_match(etag)
+        with pytest.raises(PreconditionFailedError):
+            validate_if_match(etag + '0')
+
+    with Flask(__name__).test_request_context():
+        validate_if_match(etag)
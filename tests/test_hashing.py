@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+import config
+from api.error_handlers import handle_error
+from api.errors import ServiceUnavailableError
+from api.hashing import HashingExecutor
+
+
+@pytest.fixture
+def executor():
+    """ pool of one process with a single queue slot """
+    _executor = HashingExecutor(workers=1, queue_size=1, timeout=0.1)
+    yield _executor
+    _executor._get_pool().shutdown()
+
+
+def test_full_queue_is_rejected(app, executor):
+    """ a job that timed out keeps its slot until it is done """
+    with pytest.raises(ServiceUnavailableError):
+        executor.run(time.sleep, 0.5)
+
+    with pytest.raises(ServiceUnavailableError) as error:
+        executor.run(abs, -1)
+
+    with app.app_context():
+        _, status_code, headers = handle_error(error.value)
+    assert status_code == 503
+    assert headers['Retry-After'] == str(config.HASH_RETRY_AFTER_SECONDS)
+
+    time.sleep(0.6)
+    assert executor.run(abs, -1) == 1
+    assert executor.stats()['rejected'] == 1
+    assert executor.stats()['queue_depth'] == 0
+
+
+def test_run_many(executor):
+    """ batches keep their order and are timed like single calls """
+    assert executor.run_many(abs, [(-index,) for index in range(10)]) == \
+        list(range(10))
+    assert executor.stats()['calls'] == 1
+    assert executor.stats()['queue_depth'] == 0
+
+
+def test_run_many_timeout(executor):
+    """ a batch that takes too long is a 503, like a single call """
+    with pytest.raises(ServiceUnavailableError) as error:
+        executor.run_many(time.sleep, [(0.5,)])
+    assert error.value.code == 503
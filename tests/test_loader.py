@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import event
+
+from api import rest
+from api.db.loader import batch_scope
+from api.db.util import fetch, fetch_all_by_filter, fetch_by_filter
+from api.errors import NotFoundError
+from api.models import User
+from tests.conftest import make_user
+
+
+@pytest.fixture
+def statements(sqlite_session):
+    """ a few users and the statements executed after they were added """
+    sqlite_session.add_all([make_user(index) for index in range(3)])
+    sqlite_session.commit()
+
+    executed = []
+    event.listen(sqlite_session.bind, 'before_cursor_execute',
+                 lambda *args: executed.append(args[2]))
+    return executed
+
+
+def test_loader_batches_primed_uuids(sqlite_session, statements, random_uuid):
+    """ primed uuids are fetched with a single query and memoized """
+    uuids = [user.uuid for user in sqlite_session.query(User).all()]
+    del statements[:]
+
+    with batch_scope(sqlite_session) as loader:
+        loader.prime(User, uuids + [random_uuid])
+        users = [loader.load(User, uuid) for uuid in reversed(uuids)]
+        again = loader.load_many(User, [str(uuid) for uuid in uuids])
+
+        with pytest.raises(NotFoundError):
+            loader.load(User, random_uuid)
+
+    assert [user.uuid for user in users] == list(reversed(uuids))
+    assert [user.uuid for user in again] == uuids
+    assert len(statements) == 1
+
+
+def test_fetch_with_current_session(sqlite_app, random_uuid):
+    """ the cached fetch helpers accept the scoped `current_session` """
+    with sqlite_app.test_request_context():
+        user = make_user(1)
+        user.save()
+
+        assert fetch(User, user.uuid) is user
+        assert fetch_by_filter(User, dict(email=user.email)) is user
+        assert fetch_all_by_filter(User, dict()) == [user]
+        with batch_scope() as loader:
+            assert loader.load_many(User, [user.uuid]) == [user]
+            with pytest.raises(NotFoundError):
+                loader.load(User, random_uuid)
+
+
+def test_get_loads_only_requested_fields(sqlite_app, sqlite_engine):
+    """ `get` with `fields` projects the columns of the lookup """
+    with sqlite_app.test_request_context('/?fields=first_name'):
+        user = make_user(1)
+        user.save()
+        uuid, first_name = user.uuid, user.first_name
+        sqlite_app.db_session.expunge_all()
+
+        executed = []
+        event.listen(sqlite_engine, 'before_cursor_execute',
+                     lambda *args: executed.append(args[2]))
+        response, _, headers = rest.get(User, uuid, 'user')
+
+    assert response.get_json() == {'user': {'first_name': first_name}}
+    assert 'ETag' in headers
+    assert len(executed) == 1
+    assert 'users.first_name' in executed[0]
+    assert 'users.email' not in executed[0]
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from api.db.util import (encode_cursor, decode_cursor, parse_sort,
+                         paginate_query_by_cursor, PageCount)
+from api.errors import APIError
+from api.models import User
+from tests.conftest import make_user
+
+
+@pytest.fixture
+def users(sqlite_session):
+    """ a handful of users, some without an age """
+    start = datetime(2020, 1, 1)
+    # two users share each timestamp to exercise the uuid tie-breaker
+    sqlite_session.add_all([
+        make_user(index, age=index % 3 or None,
+                  created_at=start + timedelta(days=index // 2))
+        for index in range(7)])
+    sqlite_session.commit()
+
+
+def test_parse_sort():
+    """ `+`/`-` prefixes map to ascending/descending """
+    assert parse_sort() == ('created_at', True)
+    assert parse_sort('-email') == ('email', False)
+
+
+def test_cursor_round_trip(random_uuid):
+    """ cursors keep full datetime precision """
+    value = datetime(2020, 1, 1, 10, 30, 15, 123456)
+    cursor = encode_cursor(value, random_uuid)
+
+    assert decode_cursor(cursor) == [value.isoformat(), str(random_uuid)]
+
+
+def test_invalid_cursor():
+    """ tampered cursors are rejected """
+    with pytest.raises(APIError):
+        decode_cursor('not-a-cursor')
+
+
+@pytest.mark.parametrize('sort', ['+created_at', '-created_at', '-email',
+                                  '+age', '-age'])
+def test_paginate_query_by_cursor(sqlite_session, users, sort):
+    """ walking every page returns each row exactly once, in order """
+    query = sqlite_session.query(User)
+    expected = paginate_query_by_cursor(query, User, 100, sort=sort)[0]
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = paginate_query_by_cursor(query, User, 3, sort=sort,
+                                                cursor=cursor)
+        seen.extend(page)
+        if not cursor:
+            break
+
+    assert len(expected) == 7
+    assert len(seen) == 7
+    assert [user.uuid for user in seen] == [user.uuid for user in expected]
+
+
+def test_page_count():
+    """ counts behave as ints and carry whether they are exact """
+    assert PageCount(10) == 10
+    assert PageCount(10).exact
+    assert not PageCount(10, exact=False).exact
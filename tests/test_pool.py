@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from api.db.pool import InstrumentedQueuePool
+from api.db.util import query_execution
+from api.error_handlers import QUERY_CANCELED_PGCODE, handle_error
+
+
+def test_pool_stats(tmpdir):
+    """ bounded pool times out and records usage """
+    engine = create_engine('sqlite:///{}'.format(tmpdir.join('pool.db')),
+                           poolclass=InstrumentedQueuePool, pool_size=1,
+                           max_overflow=0, pool_timeout=0.1)
+
+    connection = engine.connect()
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    connection.close()
+
+    stats = engine.pool.stats()
+    assert stats['checkouts'] == 1
+    assert stats['timeouts'] == 1
+    assert stats['peak_in_use'] == 1
+    assert stats['in_use'] == 0
+    assert stats['max_wait_ms'] >= 100
+
+
+class _QueryCanceled(Exception):
+    """ psycopg2 error of a statement canceled by `statement_timeout` """
+    pgcode = QUERY_CANCELED_PGCODE
+
+
+def test_query_timeout(app, sqlite_session, monkeypatch):
+    """ a canceled statement reaches the error handler as a timeout """
+    def execute(*args, **kwargs):
+        raise OperationalError('SELECT 1', {}, _QueryCanceled())
+    monkeypatch.setattr(sqlite_session, 'execute', execute)
+
+    with pytest.raises(OperationalError) as error:
+        query_execution('SELECT 1', sqlite_session)
+
+    with app.app_context():
+        assert handle_error(error.value)[1] == 522
@@ -0,0 +1,92 @@
+import pytest
+from flask import request
+
+import config
+
+from api import strings
+from api.auth import decode_auth_token, get_jwt, Principal
+from api.errors import UnauthorizedError
+from api.models import UserRoleEnum, UserStatusEnum
+from api.revocation import RevocationTable, revocations, token_version
+from tests.conftest import make_user
+
+
+@pytest.fixture(autouse=True)
+def local_only(monkeypatch):
+    """ the table of this process doesn't poll """
+    monkeypatch.setattr(revocations, 'enabled', False)
+
+
+@pytest.fixture
+def table():
+    """ revocation table of another process """
+    return RevocationTable(poll_interval=60, lifetime_ms=60 * 60 * 1000)
+
+
+@pytest.fixture
+def user(sqlite_session):
+    """ saved user, issued a token before any change """
+    _user = make_user(1, status=UserStatusEnum.ACTIVE.value)
+    _user.save(sqlite_session)
+    _user.version = token_version()
+    return _user
+
+
+def test_claims_principal(app, monkeypatch, random_uuid):
+    """ tokens with claims authenticate without the database, until
+    revoked """
+    monkeypatch.setattr(config, 'SECRET_KEY', 'secret')
+    claims = dict(role=UserRoleEnum.ADMIN.value,
+                  status=UserStatusEnum.ACTIVE.value, ver=token_version())
+    token = get_jwt(str(random_uuid), 5, claims=claims)
+
+    with app.test_request_context():
+        decode_auth_token(token)
+        assert request.principal.uuid == random_uuid
+        assert request.principal.role == UserRoleEnum.ADMIN.value
+
+        revocations.revoke(random_uuid, claims['ver'] + 1)
+        with pytest.raises(UnauthorizedError) as error:
+            decode_auth_token(token)
+        assert error.value.description == strings.TOKEN_REVOKED
+
+
+@pytest.mark.parametrize('claims', [
+    dict(role=UserRoleEnum.ADMIN.value, status=UserStatusEnum.INACTIVE.value),
+    dict(role=UserRoleEnum.ADMIN.value, status=UserStatusEnum.INACTIVE.value,
+         ver=0)], ids=['cached', 'claims'])
+def test_inactive_principal_rejected(app, monkeypatch, random_uuid, claims):
+    """ inactive users are rejected, with or without embedded claims """
+    monkeypatch.setattr(config, 'SECRET_KEY', 'secret')
+    monkeypatch.setattr('api.auth.principal_cache.get',
+                        lambda key: Principal(random_uuid, claims['role'],
+                                              claims['status'], None))
+    token = get_jwt(str(random_uuid), 5, claims=claims)
+
+    with app.test_request_context():
+        with pytest.raises(UnauthorizedError) as error:
+            decode_auth_token(token)
+        assert error.value.description == strings.USER_INACTIVE
+        assert getattr(request, 'principal', None) is None
+
+
+def test_access_change_seen_by_other_processes(sqlite_session, user, table):
+    """ a committed role change revokes older tokens everywhere """
+    user.role = UserRoleEnum.VENDOR.value
+    user.save(sqlite_session)
+    table.refresh(sqlite_session, force=True)
+
+    assert table.is_revoked(user.uuid, user.version)
+    assert not table.is_revoked(user.uuid, token_version() + 1)
+    assert revocations.is_revoked(user.uuid, user.version)
+
+
+def test_rolled_back_change_revokes_nothing(sqlite_session, user, table):
+    """ only committed changes revoke tokens """
+    user.status = UserStatusEnum.INACTIVE.value
+    sqlite_session.flush()
+    sqlite_session.rollback()
+    table.refresh(sqlite_session, force=True)
+
+    assert not table.is_revoked(user.uuid, user.version)
+    assert not revocations.is_revoked(user.uuid, user.version)
@@ -0,0 +1,57 @@
+import pytest
+from flask import Flask
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from api.db.session import RoutingSession, use_primary
+from api.models import User
+from tests.conftest import create_sqlite_engine, make_user
+
+
+@pytest.fixture
+def routing_session():
+    """ routing session over two sqlite databases, each holding one user """
+    engines = {}
+    for name in ('primary', 'replica'):
+        engines[name] = create_sqlite_engine()
+        _session = sessionmaker(bind=engines[name])()
+        _session.add(make_user(1, email='{}@example.com'.format(name)))
+        _session.commit()
+        _session.close()
+
+    factory = sessionmaker(class_=RoutingSession, bind=engines['primary'],
+                           replicas=[engines['replica']])
+    _session = factory()
+    yield _session
+    _session.close()
+
+
+def _emails(session):
+    return [user.email for user in session.query(User)]
+
+
+@pytest.mark.parametrize('method, database', [('GET', 'replica'),
+                                              ('POST', 'primary')])
+def test_reads_of_get_requests_use_replica(routing_session, method, database):
+    """ only GET/HEAD requests read from the replica """
+    with Flask(__name__).test_request_context(method=method):
+        assert _emails(routing_session) == ['{}@example.com'.format(database)]
+        raw = routing_session.execute(text('SELECT email FROM users'))
+        assert [row.email for row in raw] == ['{}@example.com'.format(database)]
+
+
+def test_reads_after_write_use_primary(routing_session):
+    """ a request reads its own writes """
+    with Flask(__name__).test_request_context(method='GET'):
+        routing_session.add(make_user(2, email='new@example.com'))
+        routing_session.flush()
+
+        assert sorted(_emails(routing_session)) == ['new@example.com',
+                                                    'primary@example.com']
+
+
+def test_use_primary(routing_session):
+    """ `use_primary` pins the session to the primary """
+    with Flask(__name__).test_request_context(method='GET'):
+        use_primary(routing_session)
+        assert _emails(routing_session) == ['primary@example.com']
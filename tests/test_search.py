@@ -0,0 +1,94 @@
+from difflib import SequenceMatcher
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+import config
+from api.db.search import search, SEARCH_PREFIX, SEARCH_SUBSTRING
+from api.models import User
+from tests.conftest import make_user
+
+
+@pytest.fixture(autouse=True)
+def users(sqlite_session):
+    """ users to search (sqlite runs the fallback path) """
+    emails = ('alice@example.com', 'bob@example.com', 'al_ice@test.com')
+    sqlite_session.add_all([make_user(index, email=email,
+                                      first_name=email[:3])
+                            for index, email in enumerate(emails)])
+    sqlite_session.commit()
+
+
+def test_search_substring(sqlite_session):
+    """ substring search is case insensitive """
+    result = search(User, User.email, 'ICE', session=sqlite_session)
+    assert {user.email for user in result} == {'alice@example.com',
+                                               'al_ice@test.com'}
+
+
+def test_search_escapes_wildcards(sqlite_session):
+    """ LIKE wildcards in the value are matched literally """
+    result = search(User, User.email, '_', session=sqlite_session,
+                    mode=SEARCH_SUBSTRING)
+    assert [user.email for user in result] == ['al_ice@test.com']
+
+
+def test_search_prefix(sqlite_session):
+    """ prefix matching is opt-in """
+    result = search(User, User.first_name, 'Al', session=sqlite_session,
+                    mode=SEARCH_PREFIX)
+    assert [user.email for user in result] == ['al_ice@test.com',
+                                               'alice@example.com']
+
+
+def test_search_defaults_to_substring(sqlite_session):
+    """ columns are matched anywhere unless prefix mode is asked for """
+    result = search(User, User.first_name, 'li', session=sqlite_session)
+    assert [user.email for user in result] == ['alice@example.com']
+
+
+def test_search_keeps_most_similar_candidates(sqlite_session, monkeypatch):
+    """ the candidate cap keeps the best matches (pg_trgm path) """
+    monkeypatch.setattr('api.db.search.has_trigram', lambda session: True)
+    monkeypatch.setattr(config, 'SEARCH_CANDIDATE_LIMIT', 1)
+    # stand-in for pg_trgm's similarity()
+    sqlite_session.connection().connection.create_function(
+        'similarity', 2, lambda a, b: SequenceMatcher(None, a, b).ratio())
+
+    result = search(User, User.email, 'ice', session=sqlite_session)
+
+    assert [user.email for user in result] == ['al_ice@test.com']
+
+
+class _Connection:
+    """ PostgreSQL connection recording the DDL it runs, with or without
+    pg_trgm installed """
+    dialect = postgresql.dialect()
+    engine = SimpleNamespace(name='postgresql')
+
+    def __init__(self, trigram):
+        self.trigram = trigram
+        self.ddl = []
+
+    def execute(self, stmt, **_params):
+        if 'pg_extension' in str(stmt):
+            return SimpleNamespace(first=lambda: (1,) if self.trigram
+                                   else None)
+        self.ddl.append(str(stmt.compile(dialect=self.dialect)))
+        return None
+
+
+@pytest.mark.parametrize('trigram', [False, True])
+def test_trigram_indexes_need_pg_trgm(trigram):
+    """ trigram indexes are created per server, the metadata is the same """
+    table = User.__table__
+    indexes = set(table.indexes)
+    connection = _Connection(trigram)
+
+    table.dispatch.after_create(table, connection)
+
+    assert set(table.indexes) == indexes
+    assert len(connection.ddl) == (4 if trigram else 0)
+    assert all(ddl.endswith('gin_trgm_ops) WHERE deleted_at IS NULL')
+               for ddl in connection.ddl)
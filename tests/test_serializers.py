@@ -0,0 +1,87 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import inspect
+
+from api import serializer
+from api.db.serializers import get_serializer, serialize_many
+from api.db.util import fetch_all_by_filter, parse_fields
+from api.errors import APIError
+from api.encoder import JSONEncoder
+from api.models import User, UserRoleEnum
+
+
+def _user(index):
+    return User(uuid=uuid4(), email='user{}@example.com'.format(index),
+                phone_no=str(index), role=UserRoleEnum.PARENT.value, age=index,
+                created_at=datetime(2020, 1, 1, 10, 30, 15, 123456))
+
+
+def test_serializer_matches_encoder():
+    """ precompiled output encodes like the plain attributes did """
+    user = _user(1)
+    plain = {c: getattr(user, c) for c in User.__serialize_attributes__}
+
+    assert user.serialize()['uuid'] == str(user.uuid)
+    assert json.dumps(user.serialize(), cls=JSONEncoder) == \
+        json.dumps(plain, cls=JSONEncoder)
+
+
+def test_serializer_fields():
+    """ column converters apply to explicit fields """
+    user = _user(2)
+    assert get_serializer(User, ('email', 'created_at'))(user) == \
+        {'email': 'user2@example.com', 'created_at': '2020-01-01T10:30:15.123'}
+
+
+def test_serialize_many():
+    """ lists serialize each object in order """
+    users = [_user(index) for index in range(3)]
+    assert serialize_many(users) == [user.serialize() for user in users]
+
+
+def test_json_backend_output():
+    """ the fast backend (when installed) encodes like the stdlib encoder """
+    value = {'user': _user(3), 'at': datetime(2020, 1, 1, 10, 30, 15, 123456),
+             'amount': Decimal('1.50'), 'role': UserRoleEnum.PARENT, 1: None}
+
+    assert json.loads(serializer.encode(value)) == \
+        json.loads(json.dumps(value, default=serializer.to_json))
+    assert serializer.decode(serializer.encode(value))['at'] == \
+        '2020-01-01T10:30:15.123'
+
+
+def test_non_ascii_output():
+    """ raw UTF-8 with either backend, escaped only if asked to """
+    value = {'name': 'Zo\u00eb'}
+
+    assert 'Zo\u00eb' in serializer.encode(value)
+    assert 'Zo\u00eb' in json.dumps(value, cls=JSONEncoder, ensure_ascii=False)
+    assert '"Zo\\u00eb"' in json.dumps(value, cls=JSONEncoder)
+
+
+def test_parse_fields():
+    """ sparse fieldsets are deduplicated and validated """
+    assert parse_fields(User, None) is None
+    assert parse_fields(User, ' email,uuid,email ') == ('email', 'uuid')
+
+    with pytest.raises(APIError):
+        parse_fields(User, 'email,password_hash')
+
+
+def test_sparse_fieldset_loads_only_fields(sqlite_session):
+    """ only the requested columns are loaded and serialized """
+    sqlite_session.add(_user(4))
+    sqlite_session.commit()
+    sqlite_session.expunge_all()
+
+    fields = parse_fields(User, 'email,age')
+    users = fetch_all_by_filter(User, dict(), session=sqlite_session,
+                                fields=fields)
+
+    assert serialize_many(users, fields) == \
+        [{'email': 'user4@example.com', 'age': 4}]
+    assert 'phone_no' in inspect(users[0]).unloaded
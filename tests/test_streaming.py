@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from api.db.util import fetch_chunks_by_filter, query_select
+from api.models import User
+from api.streaming import json_array_chunks, stream_response
+from tests.conftest import make_user
+
+
+def test_fetch_chunks_by_filter(sqlite_session):
+    """ rows come in chunks, released from the session once consumed """
+    sqlite_session.add_all([make_user(index) for index in range(5)])
+    sqlite_session.commit()
+
+    sizes = []
+    for chunk in fetch_chunks_by_filter(User, dict(), session=sqlite_session,
+                                        order_by='email', chunk_size=2):
+        sizes.append(len(chunk))
+        assert all(user in sqlite_session for user in chunk)
+
+    assert sizes == [2, 2, 1]
+    assert not list(sqlite_session)
+
+
+@pytest.mark.parametrize('count', [0, 1, 5])
+def test_json_array_chunks(count):
+    """ chunks join into the `{json_key: [...]}` envelope """
+    rows = [{'index': index} for index in range(count)]
+    body = ''.join(json_array_chunks(rows, 'users', chunk_size=2))
+
+    assert json.loads(body) == {'users': rows}
+
+
+def test_stream_select(sqlite_session):
+    """ streamed raw SQL yields the rows of the plain query, lazily """
+    sqlite_session.add_all([make_user(index) for index in range(5)])
+    sqlite_session.commit()
+    sql = 'SELECT email, phone_no FROM users ORDER BY email'
+
+    rows = query_select(sql, sqlite_session, stream=True, chunk_size=2)
+
+    assert not isinstance(rows, list)
+    assert list(rows) == query_select(sql, sqlite_session)
+
+
+@pytest.mark.parametrize('accept, mimetype', [
+    ('application/json', 'application/json'),
+    ('application/x-ndjson', 'application/x-ndjson')])
+def test_stream_response(sqlite_app, accept, mimetype):
+    """ rows are sent as a JSON array or as NDJSON, as negotiated """
+    rows = [{'index': index} for index in range(3)]
+
+    with sqlite_app.test_request_context(headers={'Accept': accept}):
+        response = stream_response(iter(rows), 'rows')
+        assert response.is_streamed
+        body = response.get_data(as_text=True)
+
+    assert response.mimetype == mimetype
+    if mimetype == 'application/x-ndjson':
+        assert [json.loads(line) for line in body.splitlines()] == rows
+    else:
+        assert json.loads(body) == {'rows': rows}
@@ -0,0 +1,67 @@
+import io
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from api import strings
+from api.errors import UnsupportedMediaError
+from api.helpers.user_import import (FORMAT_CSV, FORMAT_NDJSON, import_users,
+                                     iter_rows, validate_row)
+
+from .conftest import TEST_PASSWORD
+
+
+def _row(**columns):
+    row = dict(email=' User@Example.com', password=TEST_PASSWORD,
+               phone_no='1', age='', first_name='user')
+    row.update(columns)
+    return row
+
+
+def test_iter_csv_rows():
+    """ the header row names the columns, a BOM is dropped """
+    stream = io.BytesIO(b'\xef\xbb\xbfemail,phone_no\na@example.com,1\n'
+                        b'b@example.com,2\n')
+
+    assert list(iter_rows(stream, FORMAT_CSV)) == [
+        (1, {'email': 'a@example.com', 'phone_no': '1'}),
+        (2, {'email': 'b@example.com', 'phone_no': '2'})]
+
+
+def test_iter_ndjson_rows():
+    """ blank lines are skipped, unparsable ones numbered and reported """
+    stream = io.BytesIO(b'{"phone_no": "1"}\n\n[1]\n{broken\n')
+
+    assert list(iter_rows(stream, FORMAT_NDJSON)) == [
+        (1, {'phone_no': '1'}), (3, None), (4, None)]
+
+
+def test_validate_row():
+    """ allowed attributes only, normalized like a signup """
+    row = validate_row(_row(age='12', role='ADMIN'))
+
+    assert row['email'] == 'user@example.com'
+    assert row['age'] == 12
+    assert 'role' not in row
+    assert validate_row(_row())['age'] is None
+
+
+@pytest.mark.parametrize('row, error', [
+    (None, strings.INVALID_PAYLOAD),
+    (_row(phone_no=''), strings.PHONE_NO_MISSING),
+    (_row(email='user'), strings.INVALID_EMAIL),
+    (_row(password='short'), strings.PASSWORD_LENGTH_ERR),
+    (_row(age='old'), strings.INVALID_AGE),
+    (_row(phone_no='1' * 13), strings.FIELD_TOO_LONG.format('phone_no'))])
+def test_invalid_row(row, error):
+    """ invalid rows are reported with the signup messages """
+    with pytest.raises(BadRequest) as err:
+        validate_row(row)
+
+    assert err.value.description == error
+
+
+def test_unsupported_format():
+    """ only CSV and NDJSON are imported """
+    with pytest.raises(UnsupportedMediaError):
+        import_users(io.BytesIO(b''), 'xml')
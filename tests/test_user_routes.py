@@ -90,6 +90,40 @@ def test_login(client, api_version, user):
     assert 'user' in result.json
 
 
+def test_login_after_resignup(client, api_version, email, phone_no):
+    """
+    Test login after deleting the account and signing up again
+    :param client: Test client
+    :param api_version: Integer
+    :return: 200 ok with the new password, 401 with the old one
+    """
+    url = 'api/v{v}/users/{path}'.format
+    old_password, new_password = TEST_PASSWORD, 'bB654321'
+
+    def login(password):
+        return client.post(url(v=api_version, path='login'),
+                           json=dict(email=email, password=password))
+
+    def signup(password):
+        return client.post(url(v=api_version, path='signup'),
+                           json=dict(email=email, phone_no=phone_no,
+                                     password=password))
+
+    assert signup(old_password).status_code == 201
+    result = login(old_password)
+    old_uuid = result.json['user']['uuid']
+    result = client.delete(url(v=api_version, path=old_uuid),
+                           headers=dict(
+                               Authorization=result.json['access_token']))
+    assert result.status_code == 204
+
+    assert signup(new_password).status_code == 201
+    result = login(new_password)
+    assert result.status_code == 200
+    assert result.json['user']['uuid'] != old_uuid
+    assert login(old_password).status_code == 401
+
+
 def test_user_details_token_missing(client, api_version, user):
     """
     Test User Details
@@ -0,0 +1,34 @@
+import pytest
+
+from api.errors import DataConflictError
+from api.helpers.user import create_user
+from api.models import User, UserRoleEnum
+
+from .conftest import TEST_PASSWORD
+
+
+def _signup(phone_no, email):
+    return create_user(dict(phone_no=phone_no, email=email),
+                       UserRoleEnum.PARENT, TEST_PASSWORD)
+
+
+def test_signup_after_soft_delete(sqlite_app):
+    """ a soft deleted user doesn't hold on to its phone number and email """
+    with sqlite_app.app_context():
+        _signup('1', 'user@example.com').delete()
+
+        user = _signup('1', 'user@example.com')
+
+        assert user.deleted_at is None
+        assert User.find_by_email('User@example.com').uuid == user.uuid
+
+
+@pytest.mark.parametrize('phone_no, email', [('1', 'other@example.com'),
+                                             ('2', 'user@example.com')])
+def test_signup_conflicts_with_live_user(sqlite_app, phone_no, email):
+    """ live users stay unique by phone number and by email, per role """
+    with sqlite_app.app_context():
+        _signup('1', 'user@example.com')
+
+        with pytest.raises(DataConflictError):
+            _signup(phone_no, email)
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from api.db.write_behind import WriteBehindQueue
+from api.models import User
+from tests.conftest import make_user
+
+
+@pytest.fixture
+def session_factory(sqlite_engine):
+    """ sessions of the sqlite database, shared with the flusher thread """
+    return sessionmaker(bind=sqlite_engine)
+
+
+def test_write_behind_coalesces(session_factory):
+    """ updates of one row are merged into a single write """
+    session = session_factory()
+    user = make_user(1)
+    user.save(session)
+    uuid, updated_at = user.uuid, user.updated_at
+    session.close()
+
+    queue = WriteBehindQueue(session_factory, max_size=1, interval=60)
+    assert queue.enqueue(User, uuid, last_login_at=datetime(2020, 1, 1))
+    assert queue.enqueue(User, uuid, last_seen_at=datetime(2020, 1, 2))
+    assert not queue.enqueue(User, 'other', last_seen_at=datetime(2020, 1, 2))
+    queue.stop()
+
+    user = session_factory().query(User).get(uuid)
+    assert user.last_login_at == datetime(2020, 1, 1)
+    assert user.last_seen_at == datetime(2020, 1, 2)
+    assert user.updated_at == updated_at
+    assert queue.stats()['written'] == 1
+    assert queue.stats()['dropped'] == 1
+
+
+def test_write_behind_uses_app_sessions(sqlite_app, sqlite_session):
+    """ without a factory, updates are written through the app's sessions """
+    user = make_user(1)
+    user.save(sqlite_session)
+
+    queue = WriteBehindQueue(interval=60)
+    assert queue.enqueue(User, user.uuid, last_login_at=datetime(2020, 1, 1))
+    queue.flush()
+    assert queue.stats()['queue_depth'] == 1
+
+    queue.init_app(sqlite_app)
+    queue.stop()
+
+    sqlite_session.expire_all()
+    assert user.last_login_at == datetime(2020, 1, 1)